@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+local_server.py 的压测：--clients 个线程各持一条 HTTP/1.1 长连接，按 --submit 比例混合
+`GET /api/new` 与 `POST /api/submit/{token}`（提交 result.json 里的签名），
+按接口统计 p50/p99 延迟与 req/s。--gzip / --poll 模拟轮询客户端（带 Accept-Encoding、If-None-Match）。
+
+用法：
+  python3 local_server.py --port 59999 &
+  python3 loadgen.py --port 59999 --clients 32 --duration 10
+  python3 loadgen.py --no-keepalive        # 每个请求新建连接，对比长连接的收益
+  python3 loadgen.py --submit 0 --poll     # 只轮询题面，带上次的 ETag（应答 304）
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import threading
+import time
+
+ROUTES = ('GET /api/new', 'POST /api/submit')
+
+
+def quantile(sorted_xs, q):
+    return sorted_xs[min(len(sorted_xs) - 1, int(q * len(sorted_xs)))] if sorted_xs else 0.0
+
+
+def worker(idx, args, token, body, deadline, stats, lock):
+    rng = random.Random(idx)
+    lat = {r: [] for r in ROUTES}
+    errors = busy = 0
+    conn = None
+    headers = {'Accept-Encoding': 'gzip'} if args.gzip else {}
+    etag = None
+    while time.perf_counter() < deadline:
+        if conn is None:
+            conn = http.client.HTTPConnection(args.host, args.port, timeout=args.timeout)
+        route = ROUTES[1] if rng.random() < args.submit else ROUTES[0]
+        t = time.perf_counter()
+        status, close = None, True
+        try:
+            if route == ROUTES[0]:
+                conn.request('GET', '/api/new', headers=dict(headers, **{'If-None-Match': etag} if etag else {}))
+            else:
+                conn.request('POST', f'/api/submit/{token}', body, {'Content-Type': 'application/json'})
+            resp = conn.getresponse()
+            data = resp.read()
+            status, close = resp.status, resp.will_close
+            if route == ROUTES[0]:
+                ok = status in (200, 304)
+                if args.poll:
+                    etag = resp.getheader('ETag')
+            else:
+                ok = status == 200 and json.loads(data).get('ok')
+        except (OSError, http.client.HTTPException, ValueError):
+            ok = False
+        if ok:
+            lat[route].append(time.perf_counter() - t)
+        elif status == 503:
+            # 连接数或验签队列已满，服务端主动拒绝
+            busy += 1
+        else:
+            errors += 1
+            close = True
+        if close or not args.keepalive:
+            conn.close()
+            conn = None
+    if conn is not None:
+        conn.close()
+    with lock:
+        for r in ROUTES:
+            stats[r] += lat[r]
+        stats['errors'] += errors
+        stats['busy'] += busy
+
+
+def main():
+    base = os.path.dirname(os.path.abspath(__file__))
+    ap = argparse.ArgumentParser(description='local_server.py 压测')
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=59999)
+    ap.add_argument('--clients', type=int, default=16, help='并发连接数')
+    ap.add_argument('--duration', type=float, default=10.0, help='压测秒数')
+    ap.add_argument('--submit', type=float, default=0.5, help='POST /api/submit 占全部请求的比例')
+    ap.add_argument('--result', default=os.path.join(base, 'result.json'), help='提交其中的 signature')
+    ap.add_argument('--timeout', type=float, default=10.0, help='单个请求的超时秒数')
+    ap.add_argument('--gzip', action='store_true', help='GET 带 Accept-Encoding: gzip')
+    ap.add_argument('--poll', action='store_true', help='GET 带上次应答的 ETag (If-None-Match)')
+    ap.add_argument('--no-keepalive', dest='keepalive', action='store_false', help='每个请求新建连接')
+    args = ap.parse_args()
+
+    with open(args.result) as f:
+        body = json.dumps({'sig_hex': json.load(f)['signature']['sig_hex']})
+    conn = http.client.HTTPConnection(args.host, args.port, timeout=args.timeout)
+    conn.request('GET', '/api/new')
+    token = json.loads(conn.getresponse().read())['token']
+    conn.close()
+
+    stats = {r: [] for r in ROUTES}
+    stats['errors'] = stats['busy'] = 0
+    lock = threading.Lock()
+    t0 = time.perf_counter()
+    deadline = t0 + args.duration
+    threads = [threading.Thread(target=worker, args=(i, args, token, body, deadline, stats, lock))
+               for i in range(args.clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    total = sum(len(stats[r]) for r in ROUTES)
+    print(f"[loadgen] {args.clients} clients, {'keep-alive' if args.keepalive else 'new connection per request'}, "
+          f"{elapsed:.1f}s: {total} ok ({total / elapsed:,.0f} req/s), {stats['busy']} busy (503), {stats['errors']} errors")
+    for r in ROUTES:
+        lat = sorted(stats[r])
+        print(f"[loadgen] {r:<17} {len(lat):>7} ({len(lat) / elapsed:,.0f} req/s)  "
+              f"p50 {1e3 * quantile(lat, 0.5):.2f}ms  p99 {1e3 * quantile(lat, 0.99):.2f}ms  "
+              f"max {1e3 * quantile(lat, 1.0):.2f}ms")
+    return 0 if stats['errors'] == 0 else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,77 +1,160 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import gzip
+import hashlib
 import json
 import os
 import re
+import signal
 import argparse
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import HTTPServer, ThreadingHTTPServer, BaseHTTPRequestHandler
 
-from Crypto.Hash import keccak
+from secp256k1 import fixed_base, g_table, p_mul, verify_batch, verify_eth_sig
 
 
-P = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFFC2F
-N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
-Gx = 55066263022277343669578718895168534326250603453777594175500187360389116729240
-Gy = 32670510020758816978083085130507043184471273380659243275938904335757337482424
+# /api/submit_batch: most signatures accepted per request
+MAX_BATCH = 10000
+# POST bodies: room for MAX_BATCH signatures in the longest {"r", "s", "v"} form
+MAX_BODY = MAX_BATCH * 512
+# /metrics: latency histogram bucket upper bounds, seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
 
 
-def inv(a, m=N):
-    return pow(a, -1, m)
+def parse_sig(req):
+    """(r, s, v) from {"sig_hex": "0x" + r||s||v} or {"r", "s", "v"}; ValueError on bad input."""
+    if not isinstance(req, dict):
+        raise ValueError("bad fields")
+    if 'sig_hex' in req:
+        sig = str(req['sig_hex'])
+        if sig.startswith('0x'):
+            sig = sig[2:]
+        if len(sig) != 130:
+            raise ValueError("bad sig len")
+        try:
+            r = int(sig[:64], 16)
+            s = int(sig[64:128], 16)
+            v = int(sig[128:130], 16)
+        except ValueError:
+            raise ValueError("bad fields")
+    else:
+        try:
+            r = int(req['r'], 16) if isinstance(req['r'], str) else int(req['r'])
+            s = int(req['s'], 16) if isinstance(req['s'], str) else int(req['s'])
+            v = int(req['v'])
+        except Exception:
+            raise ValueError("bad fields")
+    # Normalize v to 0/1 if 27/28
+    if v in (27, 28):
+        v -= 27
+    return r, s, v
 
 
-def p_add(P1, P2):
-    if P1 is None:
-        return P2
-    if P2 is None:
-        return P1
-    x1, y1 = P1
-    x2, y2 = P2
-    if x1 == x2 and (y1 + y2) % P == 0:
-        return None
-    if x1 == x2 and y1 == y2:
-        lam = (3 * x1 * x1) * pow(2 * y1, -1, P) % P
-    else:
-        lam = (y2 - y1) * pow(x2 - x1, -1, P) % P
-    x3 = (lam * lam - x1 - x2) % P
-    y3 = (lam * (x1 - x3) - y1) % P
-    return (x3, y3)
-
-
-def p_mul(k, P0=(Gx, Gy)):
-    k %= N
-    if k == 0:
-        return None
-    Q = None
-    A = P0
-    while k:
-        if k & 1:
-            Q = p_add(Q, A)
-        A = p_add(A, A)
-        k >>= 1
-    return Q
-
-
-def keccak256(b: bytes) -> bytes:
-    h = keccak.new(digest_bits=256)
-    h.update(b)
-    return h.digest()
-
-
-def verify_eth_sig(pubkey, msg_hex: str, r: int, s: int) -> bool:
-    # Verify ECDSA signature with given pubkey Q
-    if not (1 <= r < N and 1 <= s < N):
-        return False
-    Q = pubkey
-    # compute h
-    h = int.from_bytes(keccak256(bytes.fromhex(msg_hex)), 'big') % N
-    w = inv(s)
-    u1 = (h * w) % N
-    u2 = (r * w) % N
-    X = p_add(p_mul(u1), p_mul(u2, Q))
-    if X is None:
-        return False
-    return (X[0] % N) == r
+def _init_verify_worker(pubkey):
+    # each verification process builds its own G / Q tables once
+    g_table()
+    fixed_base(pubkey)
+
+
+def _warm(_):
+    return os.getpid()
+
+
+def _interrupt(signum, frame):
+    # SIGTERM unwinds like Ctrl-C so the verification workers get shut down
+    raise KeyboardInterrupt
+
+
+def accepts_gzip(header):
+    """True if an Accept-Encoding header allows gzip (and does not give it q=0)."""
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if coding.strip().lower() in ('gzip', '*'):
+            q = params.strip()
+            try:
+                return not q.startswith('q=') or float(q[2:]) > 0
+            except ValueError:
+                return False
+    return False
+
+
+class Metrics:
+    """Per-route hit counts (by status code) and latency histograms, rendered in Prometheus text format."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.hits = {}  # (route, code) -> count
+        self.latency = {}  # route -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, route, code, seconds):
+        with self.lock:
+            self.hits[route, code] = self.hits.get((route, code), 0) + 1
+            h = self.latency.get(route)
+            if h is None:
+                h = self.latency[route] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, le in enumerate(self.buckets):
+                if seconds <= le:
+                    h[i] += 1
+            h[-2] += 1
+            h[-1] += seconds
+
+    def render(self):
+        with self.lock:
+            hits = sorted(self.hits.items())
+            latency = sorted((k, list(v)) for k, v in self.latency.items())
+        out = ['# HELP local_server_requests_total Requests served, by route and status code.',
+               '# TYPE local_server_requests_total counter']
+        out += [f'local_server_requests_total{{route="{r}",code="{c}"}} {n}' for (r, c), n in hits]
+        out += ['# HELP local_server_request_seconds Time to handle a request, by route.',
+                '# TYPE local_server_request_seconds histogram']
+        for r, h in latency:
+            out += [f'local_server_request_seconds_bucket{{route="{r}",le="{le}"}} {n}' for le, n in zip(self.buckets, h)]
+            out += [f'local_server_request_seconds_bucket{{route="{r}",le="+Inf"}} {h[-2]}',
+                    f'local_server_request_seconds_sum{{route="{r}"}} {h[-1]:.6f}',
+                    f'local_server_request_seconds_count{{route="{r}"}} {h[-2]}']
+        return ('\n'.join(out) + '\n').encode()
+
+
+class ServerBusy(Exception):
+    """The verification backlog is full; answered with 503."""
+
+
+class ConcurrentHTTPServer(ThreadingHTTPServer):
+    """
+    One thread per connection (HTTP/1.1 keep-alive: the thread stays with its connection
+    until the client closes it or it idles out), at most `max_conns` connections at once;
+    further connections get an immediate 503 instead of piling up.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, addr, handler, max_conns=256):
+        # listen backlog: the default of 5 drops SYNs (1 s client retry) as soon as a burst of clients connects
+        self.request_queue_size = min(max_conns, 1024)
+        super().__init__(addr, handler)
+        self.conns = threading.BoundedSemaphore(max_conns)
+
+    def process_request(self, request, client_address):
+        if not self.conns.acquire(blocking=False):
+            body = b'{"ok": false, "error": "server busy"}'
+            try:
+                request.sendall(b'HTTP/1.1 503 Service Unavailable\r\nContent-Type: application/json\r\n'
+                                b'Content-Length: %d\r\nConnection: close\r\n\r\n' % len(body) + body)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        super().process_request(request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self.conns.release()
 
 
 class ChallengeServer(BaseHTTPRequestHandler):
@@ -79,6 +162,13 @@ class ChallengeServer(BaseHTTPRequestHandler):
     chal = None
     token = None
     pubkey = None
+    q_table = None  # fixed-base table for pubkey, used by verify_eth_sig
+    verifier = None  # ProcessPoolExecutor for signature checks (None: in the request thread)
+    backlog = None  # semaphore bounding the verifications running or waiting for the pool
+    chal_body = None  # json.dumps(chal), serialized once in init_data
+    chal_gzip = None  # chal_body gzip-compressed
+    chal_etag = None  # strong ETag of chal_body; the gzip variant adds a -gz suffix
+    metrics = Metrics()
     cfg = None  # namespace with config
 
     @classmethod
@@ -89,6 +179,12 @@ class ChallengeServer(BaseHTTPRequestHandler):
         with open(chal_path, 'r') as f:
             cls.chal = json.load(f)
         cls.token = cls.chal.get('token')
+        # chal never changes while the server runs: serialize, compress and tag it once
+        cls.chal_body = json.dumps(cls.chal).encode()
+        cls.chal_gzip = gzip.compress(cls.chal_body, 9, mtime=0)
+        cls.chal_etag = '"%s"' % hashlib.sha256(cls.chal_body).hexdigest()[:32]
+        # fixed-base table for G, built once here instead of on the first request
+        g_table()
         # Load recovered x from result.json or env
         res_path = cfg.result_path
         if os.path.exists(res_path):
@@ -104,6 +200,19 @@ class ChallengeServer(BaseHTTPRequestHandler):
                 raise RuntimeError('Missing solution/result.json or LOCAL_CHAL_PRIV for pubkey')
             x = int(x_hex, 16)
             cls.pubkey = p_mul(x)
+        # the key never changes while the server runs: precompute its table next to G's
+        cls.q_table = fixed_base(cls.pubkey)
+
+    def _verify(self, fn, *args):
+        # CPU-bound: run it on the process pool so other connections keep being served
+        if self.verifier is None:
+            return fn(*args)
+        if not self.backlog.acquire(blocking=False):
+            raise ServerBusy
+        try:
+            return self.verifier.submit(fn, *args).result()
+        finally:
+            self.backlog.release()
 
     def _send_json(self, code: int, obj):
         data = json.dumps(obj).encode()
@@ -113,73 +222,155 @@ class ChallengeServer(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(data)
 
+    def _send_chal(self):
+        # pre-serialized body; 304 if the client already has it, gzip if it accepts it
+        etag = self.chal_etag
+        gz = accepts_gzip(self.headers.get('Accept-Encoding'))
+        if gz:
+            etag = etag[:-1] + '-gz"'
+        match = self.headers.get('If-None-Match')
+        if match is not None:
+            tags = {t.strip().removeprefix('W/') for t in match.split(',')}
+            if '*' in tags or self.chal_etag in tags or self.chal_etag[:-1] + '-gz"' in tags:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Vary', 'Accept-Encoding')
+                self.end_headers()
+                return
+        data = self.chal_gzip if gz else self.chal_body
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if gz:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('ETag', etag)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_response(self, code, message=None):
+        self.status = code
+        super().send_response(code, message)
+
+    def _timed(self, route, handler):
+        # per-route hit count and latency for /metrics
+        self.status = None
+        t = time.perf_counter()
+        try:
+            return handler()
+        finally:
+            self.metrics.observe(route, self.status or 0, time.perf_counter() - t)
+
     def do_GET(self):
-        # /api/new or /api/challenge/{token}
+        # /api/new, /api/challenge/{token} or /metrics
         if self.path == '/api/new':
-            return self._send_json(200, self.chal)
+            return self._timed('/api/new', self._send_chal)
         m = re.match(r'^/api/challenge/([0-9a-fA-F]+)$', self.path)
         if m:
             tok = m.group(1)
             if tok != self.token:
-                return self._send_json(404, {"ok": False, "error": "invalid token"})
-            return self._send_json(200, self.chal)
-        return self._send_json(404, {"ok": False, "error": "not found"})
+                return self._timed('/api/challenge', lambda: self._send_json(404, {"ok": False, "error": "invalid token"}))
+            return self._timed('/api/challenge', self._send_chal)
+        if self.path == '/metrics':
+            return self._timed('/metrics', self._send_metrics)
+        return self._timed('other', lambda: self._send_json(404, {"ok": False, "error": "not found"}))
+
+    def _send_metrics(self):
+        data = self.metrics.render()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _flag(self):
+        if self.cfg.flag is not None:
+            return self.cfg.flag
+        prefix = self.cfg.flag_prefix
+        return f"flag{{{prefix}{self.token[:8]}}}"
 
     def do_POST(self):
-        m = re.match(r'^/api/submit/([0-9a-fA-F]+)$', self.path)
+        m = re.match(r'^/api/(submit|submit_batch)/', self.path)
+        return self._timed('/api/' + m.group(1) if m else 'other', self._post)
+
+    def _post(self):
+        # read body first: on a keep-alive connection an unread body would be parsed as the next request
+        try:
+            length = int(self.headers.get('Content-Length', '0'))
+        except ValueError:
+            length = -1
+        # a negative length would make rfile.read block until EOF; the body of an oversized one stays unread
+        if length < 0:
+            self.close_connection = True
+            return self._send_json(400, {"ok": False, "error": "bad content-length"})
+        if length > MAX_BODY:
+            self.close_connection = True
+            return self._send_json(413, {"ok": False, "error": f"body larger than {MAX_BODY} bytes"})
+        try:
+            body = self.rfile.read(length)
+        except OSError:
+            self.close_connection = True
+            return self._send_json(400, {"ok": False, "error": "bad json"})
+        m = re.match(r'^/api/(submit|submit_batch)/([0-9a-fA-F]+)$', self.path)
         if not m:
             return self._send_json(404, {"ok": False, "error": "not found"})
-        tok = m.group(1)
+        route, tok = m.groups()
         if tok != self.token:
             return self._send_json(404, {"ok": False, "error": "invalid token"})
-        # read body
         try:
-            length = int(self.headers.get('Content-Length', '0'))
-            body = self.rfile.read(length)
             req = json.loads(body.decode())
         except Exception:
             return self._send_json(400, {"ok": False, "error": "bad json"})
+        try:
+            if route == 'submit_batch':
+                return self._submit_batch(req)
+            return self._submit(req)
+        except ServerBusy:
+            return self._send_json(503, {"ok": False, "error": "server busy"})
 
-        r = s = v = None
-        if 'sig_hex' in req:
-            sig = req['sig_hex']
-            if sig.startswith('0x'):
-                sig = sig[2:]
-            if len(sig) != 130:
-                return self._send_json(400, {"ok": False, "error": "bad sig len"})
-            r = int(sig[:64], 16)
-            s = int(sig[64:128], 16)
-            v = int(sig[128:130], 16)
-        else:
-            try:
-                r = int(req['r'], 16) if isinstance(req['r'], str) else int(req['r'])
-                s = int(req['s'], 16) if isinstance(req['s'], str) else int(req['s'])
-                v = int(req['v'])
-            except Exception:
-                return self._send_json(400, {"ok": False, "error": "bad fields"})
-
-        # Normalize v to 0/1 if 27/28
-        if v in (27, 28):
-            v -= 27
+    def _submit(self, req):
+        try:
+            r, s, v = parse_sig(req)
+        except ValueError as e:
+            return self._send_json(400, {"ok": False, "error": str(e)})
 
         # Verify signature on verify_hex using derived pubkey
         Q = self.pubkey
         msg_hex = self.chal['verify_hex']
-        ok = verify_eth_sig(Q, msg_hex, r, s)
+        ok = self._verify(verify_eth_sig, Q, msg_hex, r, s)
         if not ok:
             return self._send_json(200, {"ok": False, "error": "bad signature"})
 
         # Accept
-        # flag composition
-        if self.cfg.flag is not None:
-            flag = self.cfg.flag
-        else:
-            prefix = self.cfg.flag_prefix
-            flag = f"flag{{{prefix}{self.token[:8]}}}"
-        return self._send_json(200, {"ok": True, "flag": flag})
+        return self._send_json(200, {"ok": True, "flag": self._flag()})
+
+    def _submit_batch(self, req):
+        # body: [sig, ...] or {"sigs": [sig, ...]}, each sig in the /api/submit format
+        items = req.get('sigs') if isinstance(req, dict) else req
+        if not isinstance(items, list):
+            return self._send_json(400, {"ok": False, "error": "expected a list of signatures"})
+        if len(items) > MAX_BATCH:
+            return self._send_json(400, {"ok": False, "error": f"batch larger than {MAX_BATCH}"})
+        results = [None] * len(items)
+        sigs, where = [], []
+        for i, item in enumerate(items):
+            try:
+                sigs.append(parse_sig(item))
+                where.append(i)
+            except ValueError as e:
+                results[i] = {"ok": False, "error": str(e)}
+        for i, ok in zip(where, self._verify(verify_batch, self.pubkey, self.chal['verify_hex'], sigs)):
+            results[i] = {"ok": True} if ok else {"ok": False, "error": "bad signature"}
+        valid = sum(1 for x in results if x["ok"])
+        out = {"ok": valid > 0, "valid": valid, "results": results}
+        if valid:
+            out["flag"] = self._flag()
+        return self._send_json(200, out)
 
 
-def run(host='127.0.0.1', port=59999, chal_path=None, result_path=None, flag_prefix='local-', flag=None):
+def run(host='127.0.0.1', port=59999, chal_path=None, result_path=None, flag_prefix='local-', flag=None,
+        max_conns=256, workers=None, queue=64, idle=30.0):
     class Cfg:
         pass
     cfg = Cfg()
@@ -189,9 +380,34 @@ def run(host='127.0.0.1', port=59999, chal_path=None, result_path=None, flag_pre
     cfg.flag = flag
 
     ChallengeServer.init_data(cfg)
-    httpd = HTTPServer((host, port), ChallengeServer)
-    print(f"Serving HTTP on {host}:{port}\n- chal: {chal_path}\n- result: {result_path}\n- flag_prefix: {flag_prefix}\n- fixed_flag: {flag}")
-    httpd.serve_forever()
+    if max_conns <= 0:
+        # original single-threaded HTTP/1.0 server
+        httpd = HTTPServer((host, port), ChallengeServer)
+        mode = "single-threaded"
+    else:
+        ChallengeServer.protocol_version = 'HTTP/1.1'
+        ChallengeServer.timeout = idle
+        # headers and body go out as two writes; with Nagle on, every keep-alive reply waits for a delayed ACK
+        ChallengeServer.disable_nagle_algorithm = True
+        workers = os.cpu_count() if workers is None else workers
+        if workers > 0:
+            pool = ProcessPoolExecutor(workers, initializer=_init_verify_worker, initargs=(ChallengeServer.pubkey,))
+            # start every worker (and build its tables) now, before any request thread exists
+            list(pool.map(_warm, range(workers)))
+            ChallengeServer.verifier = pool
+            ChallengeServer.backlog = threading.BoundedSemaphore(workers + queue)
+        httpd = ConcurrentHTTPServer((host, port), ChallengeServer, max_conns)
+        mode = f"up to {max_conns} connections, {workers} verify workers, verify queue {queue}, keep-alive idle {idle}s"
+    print(f"Serving HTTP on {host}:{port} ({mode})\n- chal: {chal_path}\n- result: {result_path}\n- flag_prefix: {flag_prefix}\n- fixed_flag: {flag}")
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        if ChallengeServer.verifier is not None:
+            ChallengeServer.verifier.shutdown(cancel_futures=True)
 
 
 if __name__ == '__main__':
@@ -207,5 +423,10 @@ if __name__ == '__main__':
     parser.add_argument('--result', dest='result_path', default=env('LOCAL_RESULT_JSON', os.path.join(base, 'result.json')))
     parser.add_argument('--flag-prefix', dest='flag_prefix', default=env('LOCAL_FLAG_PREFIX', 'local-'))
     parser.add_argument('--flag', dest='flag', default=env('LOCAL_FLAG', None), help='fixed flag string, e.g., flag{...}. If set, overrides prefix-based flag.')
+    parser.add_argument('--max-conns', dest='max_conns', type=int, default=int(env('LOCAL_SERVER_MAX_CONNS', '256')), help='concurrent connections, one thread each (0: original single-threaded server)')
+    parser.add_argument('--workers', type=int, default=None if env('LOCAL_SERVER_WORKERS') is None else int(env('LOCAL_SERVER_WORKERS')), help='signature verification processes (default: CPU count, 0: verify in the request thread)')
+    parser.add_argument('--queue', type=int, default=int(env('LOCAL_SERVER_QUEUE', '64')), help='verifications allowed to wait for a worker before answering 503')
+    parser.add_argument('--idle', type=float, default=float(env('LOCAL_SERVER_IDLE', '30')), help='keep-alive idle timeout in seconds')
     args = parser.parse_args()
-    run(args.host, args.port, args.chal_path, args.result_path, args.flag_prefix, args.flag)
+    run(args.host, args.port, args.chal_path, args.result_path, args.flag_prefix, args.flag,
+        args.max_conns, args.workers, args.queue, args.idle)
@@ -18,6 +18,8 @@ from Crypto.Hash import keccak
 
 import cuso
 
+from secp256k1 import sign_eth
+
 
 N = ZZ(0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141)
 
@@ -128,69 +130,6 @@ def main():
     print(f"[cuso] Found x = 0x{x:064x}")
 
     # sign verify_hex in Ethereum style (low-s) and write result.json
-    # Basic secp256k1 ops
-    P = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFFC2F
-    Gx = 55066263022277343669578718895168534326250603453777594175500187360389116729240
-    Gy = 32670510020758816978083085130507043184471273380659243275938904335757337482424
-
-    def inv(a, m=int(N)):
-        return pow(a, -1, m)
-
-    def p_add(P1, P2):
-        if P1 is None:
-            return P2
-        if P2 is None:
-            return P1
-        x1, y1 = P1
-        x2, y2 = P2
-        if x1 == x2 and (y1 + y2) % P == 0:
-            return None
-        if x1 == x2 and y1 == y2:
-            lam = (3 * x1 * x1) * pow(2 * y1, -1, P) % P
-        else:
-            lam = (y2 - y1) * pow(x2 - x1, -1, P) % P
-        x3 = (lam * lam - x1 - x2) % P
-        y3 = (lam * (x1 - x3) - y1) % P
-        return (x3, y3)
-
-    def p_mul(k, P0=(Gx, Gy)):
-        k %= int(N)
-        if k == 0:
-            return None
-        Q = None
-        A = P0
-        while k:
-            if k & 1:
-                Q = p_add(Q, A)
-            A = p_add(A, A)
-            k >>= 1
-        return Q
-
-    def sign_eth(x_int: int, verify_hex: str):
-        h = int.from_bytes(keccak256(bytes.fromhex(verify_hex)), 'big') % int(N)
-        # simple deterministic k seed
-        from hashlib import sha256
-        seed = sha256(x_int.to_bytes(32,'big') + h.to_bytes(32,'big')).digest()
-        k = int.from_bytes(seed,'big') % int(N)
-        if k == 0:
-            k = 1
-        for _ in range(1000):
-            R = p_mul(k)
-            if R is None:
-                k = (k + 1) % int(N); continue
-            r = R[0] % int(N)
-            if r == 0:
-                k = (k + 1) % int(N); continue
-            s = (inv(k) * (h + r * x_int)) % int(N)
-            if s == 0:
-                k = (k + 1) % int(N); continue
-            if s > int(N)//2:
-                s = int(N) - s
-            v = R[1] & 1
-            sig_hex = "0x" + r.to_bytes(32, 'big').hex() + s.to_bytes(32, 'big').hex() + bytes([v]).hex()
-            return r, s, v, sig_hex
-        raise RuntimeError('failed sign')
-
     with open(chal_path, 'r') as f:
         chal = json.load(f)
     verify_hex = chal['verify_hex']
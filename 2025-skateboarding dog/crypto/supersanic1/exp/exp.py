@@ -3,6 +3,35 @@
 from pwn import *
 from Crypto.Util.number import bytes_to_long
 
+
+def _jacobi_py(a, n):
+    """雅可比符号 (a/n), n 为正奇数 (纯 Python, 仅在没有 gmpy2 / sympy 时使用)"""
+    a %= n
+    result = 1
+    while a:
+        while a % 2 == 0:
+            a //= 2
+            if n % 8 in (3, 5):
+                result = -result
+        a, n = n, a
+        if a % 4 == 3 and n % 4 == 3:
+            result = -result
+        a %= n
+    return result if n == 1 else 0
+
+
+# 上面的纯 Python 版每次约 8 µs, 相对 22 µs 的 pow 省不下多少: 优先用 gmpy2 的 C 实现。
+# 没有 gmpy2 时用 sympy 内部的 jacobi (不做参数检查, 约 4.5 µs); 公开的 sympy.jacobi_symbol
+# 每次要校验 n, 约 140 µs, 比不筛还慢, 不用它
+try:
+    from gmpy2 import jacobi
+except ImportError:
+    try:
+        from sympy.external.gmpy import jacobi
+    except ImportError:
+        jacobi = _jacobi_py
+
+
 # 连接到远程服务器
 # context.log_level = 'debug' # 如果需要查看详细的通信过程，可以取消注释
 r = remote('c.sk8.dog', 30004)
@@ -19,14 +48,27 @@ log.info(f"n = {n}")
 log.info(f"e = {e}")
 log.info(f"c = {c}")
 
+# e 为奇数时 (m/n) = (m^e/n) = (c/n): 先用雅可比符号筛掉约一半的候选, 只对剩下的做 pow
+target_j = jacobi(c, n) if e % 2 and n % 2 else None
+if target_j is not None:
+    log.info(f"Jacobi prefilter: (c/n) = {target_j}")
+
 # 暴力破解 PIN
 for i in range(1000000):
     # 将数字格式化为 6 位 PIN 字符串，不足的前面补 0
     # 例如: 123 -> "000123"
     pin_guess = f'{i:06d}'
+
+    # 打印进度，避免感觉程序卡死
+    if i % 10000 == 0:
+        log.info(f"Trying PIN: {pin_guess}")
     
     # 将字符串转换为整数 (模拟服务器端的加密过程)
     m_guess = bytes_to_long(pin_guess.encode())
+
+    # 雅可比符号不符的候选不可能是答案
+    if target_j is not None and jacobi(m_guess, n) != target_j:
+        continue
     
     # 使用公钥进行加密
     c_guess = pow(m_guess, e, n)
@@ -44,10 +86,6 @@ for i in range(1000000):
         
         # 成功后退出循环
         break
-    
-    # 打印进度，避免感觉程序卡死
-    if i % 10000 == 0:
-        log.info(f"Trying PIN: {pin_guess}")
 
 # 关闭连接
 r.close()
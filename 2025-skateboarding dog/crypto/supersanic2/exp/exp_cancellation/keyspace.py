@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mask-driven keyspace for the PIN brute-force engines.
+
+A mask gives one charset per position, hashcat style:
+  ?l a-z   ?u A-Z   ?d 0-9   ?s punctuation and space   ?a ?l?u?d?s
+  ?h 0-9a-f   ?H 0-9A-F   ?b 0x00-0xff   ?1..?4 custom charsets   ?? a literal '?'
+Any other character is a fixed, known position. Candidates are numbered by a
+linear index (the last position varies fastest), so a search can be split into
+index ranges. Iteration keeps the big-endian integer m up to date incrementally:
+advancing a position adds a precomputed delta * 256^k instead of rebuilding m
+from bytes for every candidate.
+"""
+
+import string
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+CHARSETS = {
+    'l': string.ascii_lowercase,
+    'u': string.ascii_uppercase,
+    'd': string.digits,
+    's': ' ' + string.punctuation,
+    'h': '0123456789abcdef',
+    'H': '0123456789ABCDEF',
+}
+CHARSETS['a'] = CHARSETS['l'] + CHARSETS['u'] + CHARSETS['d'] + CHARSETS['s']
+
+
+def _expand(spec: str, custom: Dict[str, bytes], allow_custom: bool = True) -> List[bytes]:
+    """Split a mask (or charset spec) into one bytes charset per token."""
+    out, i = [], 0
+    while i < len(spec):
+        ch = spec[i]
+        if ch != '?':
+            out.append(ch.encode('latin-1'))
+            i += 1
+            continue
+        if i + 1 >= len(spec):
+            raise ValueError(f"dangling '?' at end of {spec!r}")
+        key = spec[i + 1]
+        if key == '?':
+            out.append(b'?')
+        elif key == 'b':
+            out.append(bytes(range(256)))
+        elif key in CHARSETS:
+            out.append(CHARSETS[key].encode('latin-1'))
+        elif key in '1234' and allow_custom:
+            if key not in custom:
+                raise ValueError(f"mask uses ?{key} but no custom charset -{key} was given")
+            out.append(custom[key])
+        else:
+            raise ValueError(f"unknown mask token ?{key}")
+        i += 2
+    return out
+
+
+def parse_charset(spec: str, custom: Optional[Dict[str, bytes]] = None) -> bytes:
+    """Custom charset definition (may itself use ?l, ?d, ...), de-duplicated in order."""
+    merged = b''.join(_expand(spec, custom or {}, allow_custom=bool(custom)))
+    return bytes(dict.fromkeys(merged))
+
+
+def parse_mask(mask: str, custom: Optional[Dict[str, str]] = None) -> List[bytes]:
+    """Mask -> list of per-position charsets. custom maps '1'..'4' to charset specs."""
+    resolved: Dict[str, bytes] = {}
+    for key in sorted(custom or {}):
+        resolved[key] = parse_charset(custom[key], resolved)
+    return [bytes(dict.fromkeys(cs)) for cs in _expand(mask, resolved)]
+
+
+class Keyspace:
+    def __init__(self, positions: Sequence[bytes]):
+        if not positions or any(len(cs) == 0 for cs in positions):
+            raise ValueError("every mask position needs at least one character")
+        self.positions = [bytes(cs) for cs in positions]
+        self.length = len(self.positions)
+        self.radices = [len(cs) for cs in self.positions]
+        self.size = 1
+        for r in self.radices:
+            self.size *= r
+        # place value of each position in the linear index and in m
+        self.strides = [1] * self.length
+        for k in range(self.length - 2, -1, -1):
+            self.strides[k] = self.strides[k + 1] * self.radices[k + 1]
+        self.weights = [256 ** (self.length - 1 - k) for k in range(self.length)]
+        # adding step[k][d] moves position k from digit d to d + 1; wrap[k] returns it to 0
+        self.step = [[(cs[d + 1] - cs[d]) * w for d in range(len(cs) - 1)]
+                     for cs, w in zip(self.positions, self.weights)]
+        self.wrap = [(cs[0] - cs[-1]) * w for cs, w in zip(self.positions, self.weights)]
+        self.last = [b for b in self.positions[-1]]
+
+    @classmethod
+    def from_mask(cls, mask: str, custom: Optional[Dict[str, str]] = None) -> 'Keyspace':
+        return cls(parse_mask(mask, custom))
+
+    @classmethod
+    def from_alphabet(cls, alphabet: str, length: int) -> 'Keyspace':
+        cs = bytes(dict.fromkeys(alphabet.encode('latin-1')))
+        return cls([cs] * length)
+
+    def describe(self) -> str:
+        fixed = sum(1 for r in self.radices if r == 1)
+        return f"len={self.length}, radices={self.radices}, fixed={fixed}, total={self.size}"
+
+    def digits(self, index: int) -> List[int]:
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        return [(index // s) % r for s, r in zip(self.strides, self.radices)]
+
+    def candidate(self, index: int) -> bytes:
+        return bytes(cs[d] for cs, d in zip(self.positions, self.digits(index)))
+
+    def index_of(self, cand: bytes) -> int:
+        return sum(cs.index(b) * s for cs, b, s in zip(self.positions, cand, self.strides))
+
+    def value(self, index: int) -> int:
+        return int.from_bytes(self.candidate(index), 'big')
+
+    def iter_m(self, start: int, stop: int, num=int) -> Iterator[Tuple[int, object]]:
+        """
+        Yield (index, m) for index in [start, stop). The last position is expanded from a
+        prefix value (m = head + byte) and only carries touch the higher positions.
+        num converts the running prefix (e.g. gmpy2.mpz) so additions stay in that type.
+        """
+        stop = min(stop, self.size)
+        if start >= stop:
+            return
+        L = self.length
+        d = self.digits(start)
+        last = self.last
+        head = num(self.value(start) - last[d[-1]])
+        lo, index = d[-1], start
+        while index < stop:
+            hi = min(len(last), lo + stop - index)
+            for j in range(lo, hi):
+                yield index, head + last[j]
+                index += 1
+            if index >= stop:
+                return
+            # carry into the higher positions
+            lo = 0
+            k = L - 2
+            while k >= 0:
+                dk = d[k]
+                if dk + 1 < self.radices[k]:
+                    head += self.step[k][dk]
+                    d[k] = dk + 1
+                    break
+                head += self.wrap[k]
+                d[k] = 0
+                k -= 1
+
+    def batches(self, start: int, stop: int, size: int, num=int) -> Iterator[Tuple[int, list]]:
+        """Yield (first_index, [m, ...]) batches of at most size candidates."""
+        batch, first = [], start
+        for index, m in self.iter_m(start, stop, num):
+            batch.append(m)
+            if len(batch) == size:
+                yield first, batch
+                batch, first = [], index + 1
+        if batch:
+            yield first, batch
+
+    def matrix(self, start: int, stop: int):
+        """Candidates [start, stop) as a (count, length) uint8 NumPy matrix (batch engines)."""
+        import numpy as np
+        idx = np.arange(start, min(stop, self.size), dtype=np.int64)
+        cols = [np.frombuffer(cs, dtype=np.uint8)[(idx // s) % r]
+                for cs, s, r in zip(self.positions, self.strides, self.radices)]
+        return np.stack(cols, axis=1)
+
+    def matrix_batches(self, start: int, stop: int, size: int):
+        stop = min(stop, self.size)
+        for lo in range(start, stop, size):
+            yield lo, self.matrix(lo, min(lo + size, stop))
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Coverage planner for the multiplicative meet-in-the-middle (slow/exp_adwa.py).
+
+The MITM only recovers a PIN whose integer value m splits as m = r1 * r2 with
+r1 < B1 (table side, held in memory) and r2 < B2 (probe side, streamed). This
+planner samples candidates from the real keyspace (alphabet^len or a mask),
+factors each sampled m, and measures the covered fraction for every pair of
+power-of-two bounds. It then calibrates the per-step rates of both engines on
+this machine and picks whichever has the best chance of finishing within the
+time limit:
+
+  MITM    success ~ coverage(B1, B2), worst-case time B1 / rate_table + B2 / rate_probe
+          (one process for --mode dict, divided by the pool size for --mode disk)
+  direct  success ~ min(1, time * threads * rate / keyspace)
+
+Usage:
+  python3 mitm_plan.py -alphabet 0123456789 -len 6 -time 30 -threads 6 -mem 4G
+  python3 mitm_plan.py -mask '?d?d?d?d?d?d' -json
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+
+import gmpy2
+from gmpy2 import mpz, powmod
+
+from keyspace import Keyspace
+
+SMALL_PRIMES = [p for p in range(2, 1000) if all(p % q for q in range(2, int(p ** 0.5) + 1))]
+# Python dict entry keyed by a 512-bit mpz with an int value, measured on CPython 3.11
+DICT_ENTRY_BYTES = 220
+
+
+def _rho(n: int, rng: random.Random) -> int:
+    # Pollard-Brent: a non-trivial factor of composite n
+    if n % 2 == 0:
+        return 2
+    while True:
+        y, c, m = rng.randrange(1, n), rng.randrange(1, n), 128
+        g = r = q = 1
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(m, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                g = math.gcd(q, n)
+                k += m
+            r *= 2
+        if g == n:
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % n
+                g = math.gcd(abs(x - ys), n)
+        if g != n:
+            return g
+
+
+def factorize(n: int, rng=None) -> dict:
+    rng = rng or random.Random(0)
+    out = {}
+    for p in SMALL_PRIMES:
+        while n % p == 0:
+            out[p] = out.get(p, 0) + 1
+            n //= p
+    stack = [n] if n > 1 else []
+    while stack:
+        m = stack.pop()
+        if gmpy2.is_prime(m):
+            out[m] = out.get(m, 0) + 1
+            continue
+        d = _rho(m, rng)
+        stack += [d, m // d]
+    return out
+
+
+def divisors(fac: dict) -> list:
+    ds = [1]
+    for p, k in fac.items():
+        ds = [d * p ** i for d in ds for i in range(k + 1)]
+    return sorted(ds)
+
+
+def sample_candidates(keyspace: Keyspace, samples: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    return [keyspace.value(rng.randrange(keyspace.size)) for _ in range(samples)]
+
+
+def coverage_table(values: list, bits1: range, bits2: range) -> dict:
+    """{(b1, b2): fraction of values with a divisor r1 < 2^b1 whose cofactor is < 2^b2}"""
+    # for each value and each b1: smallest cofactor m / d over divisors d < 2^b1
+    best = []
+    for m in values:
+        if m == 0:
+            continue
+        ds = divisors(factorize(m))
+        row, j, cof = [], 0, m
+        for b1 in bits1:
+            while j < len(ds) and ds[j] < (1 << b1):
+                cof = min(cof, m // ds[j])
+                j += 1
+            row.append(cof)
+        best.append(row)
+    total = len(best) or 1
+    return {(b1, b2): sum(1 for row in best if row[i] < (1 << b2)) / total
+            for i, b1 in enumerate(bits1) for b2 in bits2}
+
+
+def calibrate(n, e: int = 65537, rounds: int = 2000) -> dict:
+    """Steps per second on this core: MITM table/probe side and direct enumeration (with the Jacobi prefilter)."""
+    n, e = mpz(n), mpz(e)
+    c = powmod(mpz(123456789), e, n)
+    table = {}
+    t0 = time.perf_counter()
+    for r in range(1, rounds):
+        table[c * powmod(r, -e, n) % n] = r
+    t_table = (time.perf_counter() - t0) / rounds
+    t0 = time.perf_counter()
+    for r in range(1, rounds):
+        x = powmod(r, e, n)
+        if x in table:
+            pass
+    t_probe = (time.perf_counter() - t0) / rounds
+    from solver_gmpy import make_range_search
+    import threading
+    ks = Keyspace.from_alphabet("0123456789", 6)
+    search = make_range_search(ks.positions, str(n), str(e), str(c))
+    t0 = time.perf_counter()
+    search(0, rounds, threading.Event())
+    t_direct = (time.perf_counter() - t0) / rounds
+    return {"table": 1 / t_table, "probe": 1 / t_probe, "direct": 1 / t_direct}
+
+
+def plan(keyspace: Keyspace, n, time_limit: float, threads: int, mem_bytes: int,
+         samples: int = 2000, disk: bool = False, rates=None) -> dict:
+    rates = rates or calibrate(n)
+    values = sample_candidates(keyspace, samples)
+    # r1 and r2 bound factors of the candidate value m, whose size is set by its bytes, not by the keyspace count
+    top = max([8] + [m.bit_length() for m in values])
+    bits1 = range(8, top + 1)
+    bits2 = range(8, top + 1)
+    cover = coverage_table(values, bits1, bits2)
+
+    direct_p = min(1.0, time_limit * threads * rates["direct"] / keyspace.size)
+    # the in-RAM dict runs in one process; the disk mode spreads both sides over the pool
+    par = threads if disk else 1
+    best = None
+    for (b1, b2), p in cover.items():
+        if not disk and (1 << b1) * DICT_ENTRY_BYTES > mem_bytes:
+            continue
+        t = ((1 << b1) / rates["table"] + (1 << b2) / rates["probe"]) / par
+        if t > time_limit or p == 0:
+            continue
+        key = (p, -t)
+        if best is None or key > best[0]:
+            best = (key, {"bits1": b1, "bits2": b2, "coverage": p, "time": t})
+    mitm = best[1] if best else None
+    engine = "mitm" if mitm and mitm["coverage"] > direct_p else "direct"
+    return {"engine": engine, "keyspace": keyspace.size, "samples": len(values), "rates": rates,
+            "direct": {"success": direct_p, "time_full": keyspace.size / (threads * rates["direct"])},
+            "mitm": mitm}
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().upper().rstrip("B").rstrip("I")
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    return int(float(text[:-1]) * units[text[-1]]) if text[-1] in units else int(text)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Choose MITM split bounds or direct enumeration for a PIN search")
+    ap.add_argument('-alphabet', type=str, default="0123456789", help='alphabet (default: digits)')
+    ap.add_argument('-len', dest='pin_len', type=int, default=6, help='PIN length (default: 6)')
+    ap.add_argument('-mask', type=str, default=None, help='hashcat-style mask (overrides -alphabet/-len)')
+    ap.add_argument('-n', type=str, default=None, help='modulus for rate calibration (default: random 512-bit RSA)')
+    ap.add_argument('-time', type=float, default=30.0, help='time limit in seconds (default: 30, the server alarm)')
+    ap.add_argument('-threads', type=int, default=6, help='cores available (default: 6)')
+    ap.add_argument('-mem', type=str, default="4G", help='memory for the in-RAM MITM table (default: 4G)')
+    ap.add_argument('-disk', action='store_true', help='table side may spill to disk (exp_adwa.py --mode disk)')
+    ap.add_argument('-samples', type=int, default=2000, help='keyspace samples to factor (default: 2000)')
+    ap.add_argument('-json', action='store_true', help='print the plan as JSON')
+    args = ap.parse_args()
+
+    keyspace = Keyspace.from_mask(args.mask) if args.mask else Keyspace.from_alphabet(args.alphabet, args.pin_len)
+    n = int(args.n) if args.n else int(gmpy2.next_prime(random.getrandbits(256)) * gmpy2.next_prime(random.getrandbits(256)))
+    t0 = time.time()
+    result = plan(keyspace, n, args.time, args.threads, parse_size(args.mem), args.samples, args.disk)
+    result["planner_seconds"] = time.time() - t0
+    if args.json:
+        print(json.dumps(result))
+        return
+    r, d, m = result["rates"], result["direct"], result["mitm"]
+    print(f"[plan] keyspace {keyspace.describe()}")
+    print(f"[plan] rates/core: direct {r['direct']:,.0f}/s, mitm table {r['table']:,.0f}/s, probe {r['probe']:,.0f}/s")
+    print(f"[plan] direct: P(success in {args.time:g}s) = {d['success']:.3f}, full sweep {d['time_full']:.1f}s")
+    if m:
+        print(f"[plan] mitm: r1 < 2^{m['bits1']}, r2 < 2^{m['bits2']}: coverage {m['coverage']:.3f}, worst case {m['time']:.1f}s")
+    else:
+        print("[plan] mitm: no split with non-zero coverage fits the time/memory limits")
+    print(f"[plan] -> {result['engine']} ({result['planner_seconds']:.1f}s to plan)")
+    if result["engine"] == "mitm":
+        print(f"       python3 ../slow/exp_adwa.py --bits {m['bits1']} --bits2 {m['bits2']}"
+              + (" --mode disk" if args.disk else ""))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vectorized Montgomery exponentiation over a batch of candidates (CPU / NumPy).
+
+This is the CPU counterpart of the Metal kernel described in GPU_Optimizations.md:
+a batch of messages is held as a limb matrix of shape (LIMBS, batch) - 32-bit
+little-endian limbs stored in uint64 lanes - and every Montgomery multiply runs
+on the whole batch at once. Products are split into low/high 32-bit halves and
+accumulated per column, so columns never overflow and carries are propagated
+once per multiply instead of once per limb product.
+
+R = 2^(32*LIMBS) is chosen with R > 4n, which keeps every intermediate below 2n
+without the conditional subtraction; the final result is compared against
+c*R mod n (and c*R mod n + n) directly in the Montgomery domain.
+
+Usage:
+  python3 mont_batch.py bench [-bits 512] [-batch 4096] [-count 65536] [-e 65537]
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+MASK = np.uint64(0xFFFFFFFF)
+SHIFT = np.uint64(32)
+
+
+class MontgomeryBatch:
+    def __init__(self, n: int):
+        n = int(n)
+        if n % 2 == 0:
+            raise ValueError("Montgomery arithmetic needs an odd modulus")
+        self.n = n
+        # R > 4n so lazily reduced values (< 2n) stay valid inputs
+        self.limbs = (n.bit_length() + 2 + 31) // 32
+        self.R = 1 << (32 * self.limbs)
+        self.n0 = np.uint64((-pow(n, -1, 1 << 32)) % (1 << 32))
+        self.N = self.to_limbs([n])  # (LIMBS, 1)
+        self.r2 = self.to_limbs([self.R * self.R % n])
+        self.one = self.to_limbs([1])
+
+    # --- conversions ---
+    def to_limbs(self, values) -> np.ndarray:
+        """Python ints -> (LIMBS, len(values)) uint64 limb matrix."""
+        raw = b"".join(int(v).to_bytes(4 * self.limbs, "little") for v in values)
+        return np.frombuffer(raw, dtype="<u4").reshape(len(values), self.limbs).T.astype(np.uint64)
+
+    def bytes_to_limbs(self, msgs: np.ndarray) -> np.ndarray:
+        """(batch, k) uint8 big-endian messages -> limb matrix, fully vectorized."""
+        batch, k = msgs.shape
+        if k > 4 * self.limbs:
+            raise ValueError("message longer than the modulus")
+        buf = np.zeros((batch, 4 * self.limbs), dtype=np.uint8)
+        buf[:, :k] = msgs[:, ::-1]
+        return buf.view("<u4").T.astype(np.uint64)
+
+    def from_limbs(self, x: np.ndarray) -> list:
+        """Limb matrix -> Python ints (normalized limbs only)."""
+        raw = np.ascontiguousarray(x.T.astype("<u4")).tobytes()
+        w = 4 * self.limbs
+        return [int.from_bytes(raw[i:i + w], "little") for i in range(0, len(raw), w)]
+
+    # --- arithmetic ---
+    def mul(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Montgomery product a*b/R mod n for every column; inputs and output < 2n."""
+        L = self.limbs
+        B = a.shape[1]
+        acc = np.zeros((2 * L + 1, B), dtype=np.uint64)
+        p = np.empty((L, B), dtype=np.uint64)
+        h = np.empty((L, B), dtype=np.uint64)
+        q = np.empty(B, dtype=np.uint64)
+        # operand scanning: column sums of 32-bit halves never exceed ~2^38
+        for i in range(L):
+            np.multiply(a[i], b, out=p)
+            np.right_shift(p, SHIFT, out=h)
+            acc[i + 1:i + L + 1] += h
+            p &= MASK
+            acc[i:i + L] += p
+        # reduction: zero one column per step and carry it upward
+        N = self.N
+        for i in range(L):
+            np.multiply(acc[i], self.n0, out=q)
+            q &= MASK
+            np.multiply(q, N, out=p)
+            np.right_shift(p, SHIFT, out=h)
+            acc[i + 1:i + L + 1] += h
+            p &= MASK
+            acc[i:i + L] += p
+            acc[i + 1] += acc[i] >> SHIFT
+        out = acc[L:2 * L]
+        for k in range(L - 1):
+            out[k + 1] += out[k] >> SHIFT
+            out[k] &= MASK
+        return out
+
+    def to_mont(self, x: np.ndarray) -> np.ndarray:
+        return self.mul(x, self.r2)
+
+    def powmod_mont(self, x_r: np.ndarray, e: int) -> np.ndarray:
+        """x_r^e in the Montgomery domain (left-to-right square-and-multiply)."""
+        y = x_r
+        for bit in bin(int(e))[3:]:
+            y = self.mul(y, y)
+            if bit == "1":
+                y = self.mul(y, x_r)
+        return y
+
+    def powmod(self, x: np.ndarray, e: int) -> np.ndarray:
+        """x^e mod n, fully reduced, as a limb matrix."""
+        y = self.mul(self.powmod_mont(self.to_mont(x), e), self.one)
+        return self._reduce(y)
+
+    def _reduce(self, y: np.ndarray) -> np.ndarray:
+        # y < 2n: subtract n where it does not borrow
+        L = self.limbs
+        diff = np.empty_like(y)
+        borrow = np.zeros(y.shape[1], dtype=np.uint64)
+        for k in range(L):
+            d = y[k] - self.N[k] - borrow
+            borrow = (d >> np.uint64(63)) & np.uint64(1)
+            diff[k] = d & MASK
+        return np.where(borrow == 0, diff, y)
+
+    def matcher(self, e: int, c: int):
+        """Return f(msgs) -> indices of rows whose message m satisfies m^e == c (mod n)."""
+        c_r = (int(c) * self.R) % self.n
+        targets = self.to_limbs([c_r, c_r + self.n])
+
+        def match(msgs: np.ndarray) -> np.ndarray:
+            y = self.powmod_mont(self.to_mont(self.bytes_to_limbs(msgs)), e)
+            hit = (y == targets[:, :1]).all(axis=0) | (y == targets[:, 1:]).all(axis=0)
+            return np.flatnonzero(hit)
+
+        return match
+
+
+def bench(bits: int, batch: int, count: int, e: int) -> None:
+    import random
+    try:
+        import gmpy2
+    except ImportError:
+        gmpy2 = None
+    rng = random.Random(1)
+    n = rng.getrandbits(bits) | (1 << (bits - 1)) | 1
+    msgs = np.frombuffer(rng.randbytes(6 * count), dtype=np.uint8).reshape(count, 6)
+    ints = [int.from_bytes(row.tobytes(), "big") for row in msgs]
+    c = pow(ints[-1], e, n)
+
+    eng = MontgomeryBatch(n)
+    match = eng.matcher(e, c)
+    # correctness: full reduced powmod on one batch against Python pow
+    head = msgs[:min(batch, 64)]
+    got = eng.from_limbs(eng.powmod(eng.bytes_to_limbs(head), e))
+    assert got == [pow(m, e, n) for m in ints[:len(head)]], "batch powmod mismatch"
+
+    t0 = time.perf_counter()
+    hits = []
+    for lo in range(0, count, batch):
+        hits += [lo + int(i) for i in match(msgs[lo:lo + batch])]
+    t_np = time.perf_counter() - t0
+    assert hits and hits[-1] == count - 1, "matcher missed the planted candidate"
+
+    print(f"[bench] n={bits} bits, limbs={eng.limbs}, e={e}, batch={batch}, candidates={count}")
+    print(f"  numpy-montgomery : {count / t_np:12,.0f} /s  ({t_np * 1e6 / count:.2f} us/candidate)")
+    t0 = time.perf_counter()
+    for m in ints:
+        pow(m, e, n) == c
+    t_py = time.perf_counter() - t0
+    print(f"  python pow       : {count / t_py:12,.0f} /s  ({t_py * 1e6 / count:.2f} us/candidate)")
+    if gmpy2 is not None:
+        nz, cz, ez = gmpy2.mpz(n), gmpy2.mpz(c), gmpy2.mpz(e)
+        zs = [gmpy2.mpz(m) for m in ints]
+        t0 = time.perf_counter()
+        for m in zs:
+            gmpy2.powmod(m, ez, nz) == cz
+        t_gmp = time.perf_counter() - t0
+        print(f"  gmpy2.powmod     : {count / t_gmp:12,.0f} /s  ({t_gmp * 1e6 / count:.2f} us/candidate)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="NumPy batch Montgomery exponentiation")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("bench", help="compare against per-candidate powmod")
+    b.add_argument('-bits', type=int, default=512, help='modulus size in bits (default: 512)')
+    b.add_argument('-batch', type=int, default=4096, help='candidates per batch (default: 4096)')
+    b.add_argument('-count', type=int, default=1 << 16, help='candidates to test (default: 65536)')
+    b.add_argument('-e', type=int, default=65537, help='public exponent (default: 65537)')
+    args = ap.parse_args()
+    if args.cmd == "bench":
+        bench(args.bits, args.batch, args.count, args.e)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
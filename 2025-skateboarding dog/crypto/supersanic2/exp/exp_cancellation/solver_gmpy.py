@@ -3,15 +3,23 @@
 
 import sys
 import time
-import math
-import threading
 import multiprocessing as mp
 import argparse
-import itertools
 import string
 import os
+import json
+import hashlib
 from typing import List
 
+from keyspace import Keyspace
+
+# search_metrics / tile_coord are shared with the three-factor RSA BSGS solver; the one
+# copy lives in 20250923-某金融业/三因子rsa/solution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), *[os.pardir] * 5,
+                             "20250923-某金融业", "三因子rsa", "solution"))
+from search_metrics import SearchMetrics, attach_worker, worker_tick
+from tile_coord import Coordinator, parse_address, run_worker
+
 try:
     import gmpy2
     from gmpy2 import mpz, powmod
@@ -27,163 +35,242 @@ PRESET_N = mpz("1279723856793937332729074018106792865503671514008636622869560035
 PRESET_E = mpz(65537)
 PRESET_C = mpz("3527077117699128297213675720714263452674443031519633052631407312233044869485683860610136570675841069826332336207623212194708283745914346102673061030089974")
 
-
-class AtomicCounter:
-    def __init__(self):
-        self._val = 0
-        self._lock = threading.Lock()
-    def add(self, n: int) -> None:
-        with self._lock:
-            self._val += n
-    def get(self) -> int:
-        with self._lock:
-            return self._val
-
-
-def fast_powmod_65537(base: mpz, n: mpz) -> mpz:
-    # Compute base^65537 mod n using 16 squarings + multiply
-    t = mpz(base)
-    for _ in range(16):
-        t = (t * t) % n
-    return (t * base) % n
-
-
-def worker_thread(idx: int, step: int, alphabet_bytes: List[int], pin_len: int,
-                  n: mpz, e: mpz, c: mpz, found_evt: threading.Event,
-                  result_box: List[str], attempts: AtomicCounter, batch: int = 256):
-    L = len(alphabet_bytes)
-
-    # Pre-allocate pin bytes array
-    pin = bytearray(pin_len)
-
-    # Helper to test a full pin (pin as bytearray)
-    def test_current_pin() -> bool:
-        # Build mpz from bytes using CPython C fastpath to reduce GIL contention
-        m = mpz(int.from_bytes(pin, 'big', signed=False))
-        # Use gmpy2.powmod (fast, C-level)
-        ct = powmod(m, e, n)
-        if ct == c:
+# Returned by a range search that saw the stop event before reaching the end of its range
+STOPPED = object()
+
+
+def jacobi_target(n: mpz, e: mpz, c: mpz):
+    # For odd e, Jacobi(m^e, n) = Jacobi(m, n)^e = Jacobi(m, n), so the true PIN must
+    # have Jacobi(m, n) == Jacobi(c, n). A Jacobi symbol costs a few percent of a
+    # 512-bit powmod and rejects about half of all candidates. None disables the filter.
+    if e % 2 == 0 or n % 2 == 0:
+        return None
+    return gmpy2.jacobi(c, n)
+
+
+class TileQueue:
+    # Dynamic partitioning: the keyspace is cut into index-range tiles handed out by a
+    # shared counter, so a fast process simply pulls more tiles than a slow one.
+    # Finished tiles are reported back on done_q (via done()) for the checkpoint.
+    def __init__(self, ctx, total: int, tile_size: int, done=()):
+        self.total = total
+        self.tile_size = tile_size
+        self.count = -(-total // tile_size)
+        self.skip = frozenset(done)
+        self.next_tile = ctx.Value('q', 0)
+        self.done_q = ctx.Queue()
+
+    def tiles(self, found):
+        # Yields (tile, start, stop); the caller reports fully scanned tiles with done()
+        while not found.is_set():
+            with self.next_tile.get_lock():
+                t = self.next_tile.value
+                self.next_tile.value += 1
+            if t >= self.count:
+                return
+            if t in self.skip:
+                continue
+            yield t, t * self.tile_size, min((t + 1) * self.tile_size, self.total)
+
+    def done(self, t: int) -> None:
+        self.done_q.put(t)
+
+    def drain(self) -> List[int]:
+        out = []
+        while True:
             try:
-                result_box[0] = pin.decode('latin-1', errors='ignore')
+                out.append(self.done_q.get_nowait())
             except Exception:
-                # Fallback: keep raw bytes mapped via latin-1
-                result_box[0] = bytes(pin).decode('latin-1', errors='ignore')
-            return True
-        return False
-
-    local = 0
-    # Partition by first character position
-    for i0 in range(idx, L, step):
-        if found_evt.is_set():
-            break
-        pin[0] = alphabet_bytes[i0]
-
-        for i1 in range(L):
-            pin[1] = alphabet_bytes[i1]
-            for i2 in range(L):
-                pin[2] = alphabet_bytes[i2]
-                for i3 in range(L):
-                    pin[3] = alphabet_bytes[i3]
-                    for i4 in range(L):
-                        pin[4] = alphabet_bytes[i4]
-                        for i5 in range(L):
-                            if found_evt.is_set():
-                                break
-                            pin[5] = alphabet_bytes[i5]
-                            if test_current_pin():
-                                found_evt.set()
-                                return
-                            local += 1
-                            if local == batch:
-                                attempts.add(local)
-                                local = 0
-                    if found_evt.is_set():
-                        break
-                if found_evt.is_set():
-                    break
-            if found_evt.is_set():
-                break
-    if local:
-        attempts.add(local)
-
-
-def progress_thread(total: int, attempts: AtomicCounter, start_ts: float, stop_evt: threading.Event):
-    spinner = ['|', '/', '-', '\\']
-    s = 0
-    while not stop_evt.wait(0.2):
-        tried = attempts.get()
-        elapsed = time.time() - start_ts
-        rate = tried / elapsed if elapsed > 0 else 0.0
-        frac = min(1.0, tried / total) if total > 0 else 0.0
-        barw = 30
-        filled = int(barw * frac)
-        bar = '#' * filled + '-' * (barw - filled)
-        eta = (total - tried) / rate if rate > 1e-9 else float('inf')
-        sys.stderr.write(f"\r[{bar}] {frac*100:5.1f}% {spinner[s%4]} tried={tried}/{total} rate={rate:,.0f}/s eta={'∞' if math.isinf(eta) else f'{eta:,.1f}s'}")
-        sys.stderr.flush()
-        s += 1
-    # clear line
-    sys.stderr.write("\r" + " " * 100 + "\r")
-    sys.stderr.flush()
+                return out
 
+    def tile_len(self, t: int) -> int:
+        return min((t + 1) * self.tile_size, self.total) - t * self.tile_size
+
+
+def _intervals(tiles) -> List[List[int]]:
+    out = []
+    for t in sorted(tiles):
+        if out and out[-1][1] == t:
+            out[-1][1] = t + 1
+        else:
+            out.append([t, t + 1])
+    return out
+
+
+def search_id(positions: List[bytes], n, e, c, tile_size: int) -> str:
+    h = hashlib.sha256(repr(([p.hex() for p in positions], int(n), int(e), int(c), tile_size)).encode())
+    return h.hexdigest()[:16]
+
+
+def load_checkpoint(path: str, sid: str):
+    # Returns (done tile ids, found PIN or None); a checkpoint of another search is an error
+    if not path or not os.path.exists(path):
+        return set(), None
+    with open(path) as f:
+        state = json.load(f)
+    if state.get("search") != sid:
+        raise SystemExit(f"[ERROR] checkpoint {path} belongs to a different search (keyspace/n/e/c/-tile); "
+                         "remove it or pass another -checkpoint")
+    done = {t for a, b in state.get("done", []) for t in range(a, b)}
+    return done, state.get("found")
+
+
+def save_checkpoint(path: str, sid: str, tile_size: int, done, found=None) -> None:
+    if not path:
+        return
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"search": sid, "tile": tile_size, "done": _intervals(done), "found": found}, f)
+    os.replace(tmp, path)
+
+
+def make_range_search(positions: List[bytes], n_str: str, e_str: str, c_str: str,
+                      engine: str = 'gmpy2', batch: int = 2048):
+    # Per-tile kernel shared by local processes and remote nodes:
+    # search(start, stop, stop_evt) -> PIN string, None once the whole index range is scanned,
+    # or STOPPED if stop_evt cut it short
+    keyspace = Keyspace(positions)
+    if engine == 'numpy':
+        # Batch engine: fixed-size candidate batches through the vectorized Montgomery exponentiation
+        from mont_batch import MontgomeryBatch
+        match = MontgomeryBatch(int(n_str)).matcher(int(e_str), int(c_str))
+
+        def search(start: int, stop: int, stop_evt):
+            for _, msgs in keyspace.matrix_batches(start, stop, batch):
+                if stop_evt.is_set():
+                    return STOPPED
+                hits = match(msgs)
+                if len(hits):
+                    return msgs[hits[0]].tobytes().decode('latin-1', 'ignore')
+                worker_tick(len(msgs))
+            return None
+        return search
 
-def proc_worker(proc_idx: int, proc_cnt: int, alphabet_str: str, pin_len: int,
-                n_str: str, e_str: str, c_str: str,
-                found: 'mp.Event', out_q: 'mp.Queue', attempts_shm: 'mp.Value'):
     # Re-import inside process
     import gmpy2
     from gmpy2 import mpz, powmod
     n_loc = mpz(n_str)
     e_loc = mpz(e_str)
     c_loc = mpz(c_str)
-    # Use bytes for faster indexing
-    ab = alphabet_str.encode('latin-1', 'ignore')
-    Lloc = len(ab)
-    pin = bytearray(pin_len)
-    batch = 256
-    local = 0
-
-    def test_pin() -> bool:
-        m = mpz(int.from_bytes(pin, 'big', signed=False))
-        return powmod(m, e_loc, n_loc) == c_loc
-
-    for i0 in range(proc_idx, Lloc, proc_cnt):
-        if found.is_set():
-            break
-        pin[0] = ab[i0]
-        for i1 in range(Lloc):
-            pin[1] = ab[i1]
-            for i2 in range(Lloc):
-                pin[2] = ab[i2]
-                for i3 in range(Lloc):
-                    pin[3] = ab[i3]
-                    for i4 in range(Lloc):
-                        pin[4] = ab[i4]
-                        for i5 in range(Lloc):
-                            if found.is_set():
-                                break
-                            pin[5] = ab[i5]
-                            if test_pin():
-                                try:
-                                    out_q.put_nowait(bytes(pin).decode('latin-1', 'ignore'))
-                                except Exception:
-                                    out_q.put_nowait(bytes(pin).decode('latin-1', 'ignore'))
-                                found.set()
-                                return
-                            local += 1
-                            if local == batch:
-                                with attempts_shm.get_lock():
-                                    attempts_shm.value += local
-                                local = 0
-                    if found.is_set():
-                        break
-                if found.is_set():
-                    break
-            if found.is_set():
-                break
-    if local:
-        with attempts_shm.get_lock():
-            attempts_shm.value += local
+    target_j = jacobi_target(n_loc, e_loc, c_loc)
+    jacobi = gmpy2.jacobi
+    tick = 256
+
+    def search(start: int, stop: int, stop_evt):
+        local = 0
+        # m is carried incrementally by the keyspace odometer; no per-candidate from_bytes
+        for index, m in keyspace.iter_m(start, stop, mpz):
+            if (target_j is None or jacobi(m, n_loc) == target_j) and powmod(m, e_loc, n_loc) == c_loc:
+                return keyspace.candidate(index).decode('latin-1', 'ignore')
+            local += 1
+            if local == tick:
+                worker_tick(local)
+                local = 0
+                if stop_evt.is_set():
+                    return STOPPED
+        worker_tick(local)
+        return None
+    return search
+
+
+def proc_worker(proc_idx: int, tiles: TileQueue, positions: List[bytes],
+                n_str: str, e_str: str, c_str: str,
+                found: 'mp.Event', out_q: 'mp.Queue', metrics_handle,
+                engine: str = 'gmpy2', batch: int = 2048):
+    # One metrics slot per process so per-worker rates are reported
+    attach_worker(metrics_handle, slot=proc_idx)
+    search = make_range_search(positions, n_str, e_str, c_str, engine, batch)
+    for t, start, stop in tiles.tiles(found):
+        pin = search(start, stop, found)
+        if pin is STOPPED:
+            return
+        if pin is not None:
+            out_q.put_nowait(pin)
+            found.set()
+            return
+        # only a range scanned end to end with the stop event still clear goes into the checkpoint
+        if not found.is_set():
+            tiles.done(t)
+
+
+def remote_kernel(job: dict):
+    # Build the per-tile kernel from the job description a coordinator hands out
+    positions = [bytes.fromhex(p) for p in job["positions"]]
+    search = make_range_search(positions, job["n"], job["e"], job["c"], job["engine"], job["batch"])
+    tile_size, total = job["tile"], job["total"]
+
+    def kernel(tile: int, stop_evt):
+        # run_worker only reports a tile done if stop_evt is still clear after a None
+        pin = search(tile * tile_size, min((tile + 1) * tile_size, total), stop_evt)
+        return None if pin is STOPPED else pin
+    return kernel
+
+
+def node_worker(proc_idx: int, address, metrics_handle):
+    # One coordinator connection per process; tiles are leased one at a time
+    attach_worker(metrics_handle, slot=proc_idx)
+    run_worker(address, remote_kernel)
+
+
+def run_node(address, threads: int, metrics_path: str = None) -> None:
+    # -coordinator mode: lend this machine's cores to a remote -serve search
+    ctx = mp.get_context("spawn")
+    metrics = SearchMetrics("node", threads, path=metrics_path, ctx=ctx)
+    sys.stderr.write(f"[INFO] node: {threads} workers -> coordinator {address[0]}:{address[1]}\n")
+    with metrics:
+        procs = [ctx.Process(target=node_worker, args=(i, address, metrics.handle), daemon=True) for i in range(threads)]
+        for p in procs:
+            p.start()
+        try:
+            for p in procs:
+                p.join()
+        except KeyboardInterrupt:
+            sys.stderr.write("\n[INFO] Interrupted\n")
+    sys.stderr.write("[INFO] node: coordinator finished the search\n")
+
+
+def serve(args, keyspace: Keyspace, n, e, c, tile_size: int, threads: int, sid: str, done_tiles) -> None:
+    # -serve mode: the coordinator owns the tiles and the checkpoint; nodes (and -threads local
+    # workers connecting back to it) lease tiles, report them done and heartbeat; tiles of a
+    # node that dies or goes silent for -lease seconds are handed to someone else
+    job = {"positions": [p.hex() for p in keyspace.positions], "n": str(n), "e": str(e), "c": str(c),
+           "engine": args.engine, "batch": args.batch, "tile": tile_size, "total": keyspace.size}
+    count = -(-keyspace.size // tile_size)
+    coord = Coordinator(job, [count], lease=args.lease, done=done_tiles)
+    host, port = coord.start(parse_address(args.serve))
+    sys.stderr.write(f"[INFO] coordinator on {host}:{port}: {count} tiles of {tile_size}, {len(done_tiles)} already done\n")
+
+    ctx = mp.get_context("spawn")
+    procs = [ctx.Process(target=run_worker, args=(("127.0.0.1", port), remote_kernel), daemon=True) for _ in range(threads)]
+    for p in procs:
+        p.start()
+
+    def on_poll(co):
+        snap = co.snapshot()
+        sys.stderr.write(f"\r[coord] done {len(snap['done'])}/{count} tiles, {snap['leased']} leased, {snap['workers']} workers seen ")
+        sys.stderr.flush()
+        save_checkpoint(args.checkpoint, sid, tile_size, snap["done"])
+
+    deadline = time.time() + args.timeout if args.timeout and args.timeout > 0 else None
+    try:
+        results = coord.wait(timeout=args.timeout or None, on_poll=on_poll)
+    except KeyboardInterrupt:
+        sys.stderr.write("\n[INFO] Interrupted\n")
+        results = coord.snapshot()["results"]
+    result_pin = results.get(0)
+    save_checkpoint(args.checkpoint, sid, tile_size, coord.snapshot()["done"], result_pin)
+    coord.close()
+    for p in procs:
+        p.join(timeout=1)
+        p.terminate()
+    if result_pin:
+        print(result_pin)
+        sys.exit(0)
+    if deadline is not None and time.time() >= deadline:
+        sys.stderr.write("\n[FAILURE] Timeout\n")
+    else:
+        sys.stderr.write("\n[FAILURE] Not found\n")
+    sys.exit(1)
 
 
 def main():
@@ -194,9 +281,31 @@ def main():
     ap.add_argument('-len', dest='pin_len', type=int, default=6, help='PIN length (default: 6)')
     ap.add_argument('-threads', dest='threads', type=int, default=6, help='thread count (default: 6)')
     ap.add_argument('-alphabet', dest='alphabet', type=str, default=DEFAULT_ALPHABET, help='alphabet to search')
+    ap.add_argument('-mask', dest='mask', type=str, default=None,
+                    help='hashcat-style mask, e.g. "?d?d?d?d?d?d" or "PIN?u?1?1" (overrides -len/-alphabet)')
+    for k in '1234':
+        ap.add_argument(f'-{k}', dest=f'cs{k}', type=str, default=None, help=f'custom charset for ?{k} in -mask')
     ap.add_argument('-timeout', dest='timeout', type=int, default=0, help='timeout seconds (0=no timeout)')
+    ap.add_argument('-engine', dest='engine', choices=('gmpy2', 'numpy'), default='gmpy2',
+                    help='gmpy2: per-candidate powmod with Jacobi prefilter; numpy: batched Montgomery (see mont_batch.py bench)')
+    ap.add_argument('-batch', dest='batch', type=int, default=2048, help='candidates per batch for -engine numpy (default: 2048)')
+    ap.add_argument('-tile', dest='tile', type=int, default=0,
+                    help='candidates per work tile pulled by the processes (default: auto)')
+    ap.add_argument('-checkpoint', dest='checkpoint', type=str, default=None,
+                    help='record finished tiles in this file and resume from it on the next run')
+    ap.add_argument('-serve', dest='serve', type=str, default=None, metavar='HOST:PORT',
+                    help='coordinate a multi-node search: hand out tiles to -coordinator nodes (and -threads local workers)')
+    ap.add_argument('-coordinator', dest='coordinator', type=str, default=None, metavar='HOST:PORT',
+                    help='node mode: fetch the search from a -serve coordinator and work its tiles')
+    ap.add_argument('-lease', dest='lease', type=float, default=30.0,
+                    help='seconds before a silent node\'s tiles are reassigned (default: 30)')
+    ap.add_argument('-metrics', dest='metrics', type=str, default=None, help='append per-second search metrics as JSON lines to this file')
     args = ap.parse_args()
 
+    if args.coordinator:
+        run_node(parse_address(args.coordinator), max(1, int(args.threads)), args.metrics)
+        return
+
     # Apply defaults if missing n/c
     if not args.n or not args.c:
         n = PRESET_N
@@ -213,73 +322,98 @@ def main():
         c = mpz(args.c)
         alphabet = args.alphabet
 
-    pin_len = args.pin_len
-    threads = max(1, int(args.threads))
+    threads = max(0 if args.serve else 1, int(args.threads))
 
-    # Prepare alphabet as bytes list
-    alphabet_bytes = [ord(ch) for ch in alphabet]
-    base = len(alphabet_bytes)
-    total = base ** pin_len
+    # Keyspace: a mask gives per-position charsets and fixed characters, otherwise alphabet^len
+    if args.mask:
+        custom = {k: getattr(args, f'cs{k}') for k in '1234' if getattr(args, f'cs{k}') is not None}
+        keyspace = Keyspace.from_mask(args.mask, custom)
+    else:
+        keyspace = Keyspace.from_alphabet(alphabet, args.pin_len)
+    total = keyspace.size
+
+    sys.stderr.write(f"[INFO] keyspace {keyspace.describe()}\n")
+    sys.stderr.write(f"[INFO] threads={threads}, engine={args.engine}\n")
+    target_j = jacobi_target(n, e, c)
+    if target_j is not None and args.engine == 'gmpy2':
+        sys.stderr.write(f"[INFO] Jacobi prefilter on: J(c, n) = {target_j}, ~half of candidates skip powmod\n")
+
+    # Work tiles: ~64 per process by default, bounded so checkpoints stay frequent
+    tile_size = args.tile if args.tile > 0 else max(1024, min(1 << 22, total // (max(threads, 1) * 64) or 1))
+    sid = search_id(keyspace.positions, n, e, c, tile_size)
+    done_tiles, found_pin = load_checkpoint(args.checkpoint, sid)
+    if found_pin is not None:
+        sys.stderr.write(f"[INFO] checkpoint {args.checkpoint} already holds the result\n")
+        print(found_pin)
+        sys.exit(0)
 
-    sys.stderr.write(f"[INFO] alphabet={base}, len={pin_len}, total={total}\n")
-    sys.stderr.write(f"[INFO] threads={threads}\n")
+    if args.serve:
+        serve(args, keyspace, n, e, c, tile_size, threads, sid, done_tiles)
+        return
 
     # Switch to multi-processing to fully utilize multiple cores
     ctx = mp.get_context("spawn")
-    attempts_val = ctx.Value('Q', 0)  # unsigned long long
     found_evt = ctx.Event()
     result_q = ctx.Queue(1)
+    tiles = TileQueue(ctx, total, tile_size, done_tiles)
+    resumed = sum(tiles.tile_len(t) for t in done_tiles)
+    sys.stderr.write(f"[INFO] {tiles.count} tiles of {tile_size}"
+                     + (f", resuming with {len(done_tiles)} done ({resumed} candidates)" if done_tiles else "") + "\n")
 
-    # progress (reads attempts_val via small wrapper)
-    class ProcAttempts:
-        def __init__(self, val): self.val = val
-        def add(self, n):
-            with self.val.get_lock():
-                self.val.value += n
-        def get(self):
-            return self.val.value
-
-    attempts_proxy = ProcAttempts(attempts_val)
-    stop_progress_evt = threading.Event()
-    start_ts = time.time()
-    prog = threading.Thread(target=progress_thread, args=(total, attempts_proxy, start_ts, stop_progress_evt), daemon=True)
-    prog.start()
-
-    # spawn processes
-    procs: list[mp.Process] = []
-    for i in range(threads):
-        p = ctx.Process(target=proc_worker, args=(i, threads, alphabet, pin_len, str(n), str(e), str(c), found_evt, result_q, attempts_val))
-        p.daemon = True
-        p.start()
-        procs.append(p)
+    # progress: per-process counters sampled by SearchMetrics (status line + optional JSON lines)
+    metrics = SearchMetrics("gmpy2-powmod" if args.engine == 'gmpy2' else "numpy-montgomery", threads, total=total, path=args.metrics, ctx=ctx)
+    metrics.gauge("radices", keyspace.radices)
+    metrics.gauge("tiles", tiles.count)
+    metrics.add_resumed(resumed)
 
     # Optional timeout
     deadline = time.time() + args.timeout if args.timeout and args.timeout > 0 else None
 
     result_pin = None
-    try:
-        while True:
-            if not result_q.empty():
-                result_pin = result_q.get_nowait()
-                found_evt.set()
-                break
-            if found_evt.is_set():
-                break
-            if deadline is not None and time.time() >= deadline:
-                break
-            if all(not p.is_alive() for p in procs):
-                break
-            time.sleep(0.05)
-    finally:
-        stop_progress_evt.set()
-        prog.join(timeout=1)
+    procs: list[mp.Process] = []
+    with metrics:
+        # spawn processes
+        for i in range(threads):
+            p = ctx.Process(target=proc_worker, args=(i, tiles, keyspace.positions, str(n), str(e), str(c),
+                                                      found_evt, result_q, metrics.handle, args.engine, args.batch))
+            p.daemon = True
+            p.start()
+            procs.append(p)
+
+        last_save = time.time()
+        try:
+            while True:
+                if not result_q.empty():
+                    result_pin = result_q.get_nowait()
+                    found_evt.set()
+                    break
+                if found_evt.is_set():
+                    break
+                if deadline is not None and time.time() >= deadline:
+                    break
+                if all(not p.is_alive() for p in procs):
+                    break
+                if time.time() - last_save >= 1.0:
+                    done_tiles.update(tiles.drain())
+                    metrics.gauge("tiles_done", len(done_tiles))
+                    save_checkpoint(args.checkpoint, sid, tile_size, done_tiles)
+                    last_save = time.time()
+                time.sleep(0.05)
+        except KeyboardInterrupt:
+            sys.stderr.write("\n[INFO] Interrupted\n")
+        found_evt.set()
 
     for p in procs:
+        p.join(timeout=0.5)
         try:
             p.terminate()
         except Exception:
             pass
         p.join(timeout=0.1)
+    if result_pin is None and not result_q.empty():
+        result_pin = result_q.get_nowait()
+    done_tiles.update(tiles.drain())
+    save_checkpoint(args.checkpoint, sid, tile_size, done_tiles, result_pin)
 
     if result_pin:
         print(result_pin)
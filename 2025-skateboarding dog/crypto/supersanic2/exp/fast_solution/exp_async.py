@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+exp.py 的 asyncio 版本: 把所有固定启动开销挪到 30 秒计时之外。
+
+- 预先启动 --pool 个常驻 solver (`./solve --serve`), 各自在管道上等题目;
+- PoW 在进程内求解 (pow.py 的 solve_challenge), 放在预热好的进程池里跑, 不再 fork python3;
+- n / e / c 三行一到就把 "n e c" 写给空闲的 solver, 读回 PIN 立即提交;
+- --conns 条连接并发, 共尝试 --attempts 次, 拿到 flag 即全部取消
+  (MITM 只覆盖能拆成 r1 * r2 的 PIN, 多连几次等于多抽几次, 覆盖率见 ../exp_cancellation/mitm_plan.py)。
+
+用法:
+  g++ -std=c++17 -O3 -o solve solve.cpp -lgmp -pthread
+  python3 exp_async.py --conns 2 --attempts 10
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pow as kctf_pow
+
+HOST = "c.sk8.dog"
+PORT = 30005
+CPP_EXECUTABLE = "./solve"
+
+POW_RE = re.compile(r"solve (s\.\S+)")
+PARAM_RE = re.compile(r"^([nec]) = (\d+)$")
+FLAG_RE = re.compile(rb"\w+\{[^}]*\}")
+
+
+def log(tag, msg):
+    print(f"[{time.strftime('%H:%M:%S')}] [{tag}] {msg}", flush=True)
+
+
+class WarmSolver:
+    """一个常驻的 ./solve --serve 进程: 每写一行 "n e c" 回一行 PIN 的十六进制或 "-" """
+
+    def __init__(self, cmd):
+        self.cmd = cmd
+        self.proc = None
+
+    async def start(self):
+        self.proc = await asyncio.create_subprocess_exec(
+            *self.cmd, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE)
+        ready = await self.proc.stdout.readline()
+        if ready.strip() != b"ready":
+            raise RuntimeError(f"solver did not start: {ready!r}")
+        return self
+
+    async def solve(self, n, e, c):
+        self.proc.stdin.write(f"{n} {e} {c}\n".encode())
+        await self.proc.stdin.drain()
+        line = (await self.proc.stdout.readline()).strip()
+        if not line:
+            raise RuntimeError("solver exited")
+        return None if line == b"-" else bytes.fromhex(line.decode())
+
+    def kill(self):
+        if self.proc is not None and self.proc.returncode is None:
+            self.proc.kill()
+
+
+class SolverPool:
+    def __init__(self, cmd, size):
+        self.cmd = cmd
+        self.size = size
+        self.idle = asyncio.Queue()
+        self.solvers = set()
+        self.replacing = set()  # 后台补 solver 的任务, 留着引用以免被回收, 关闭时等它们结束
+        self.closed = False
+
+    async def _spawn(self):
+        solver = WarmSolver(self.cmd)
+        self.solvers.add(solver)
+        await solver.start()
+        if self.closed:
+            solver.kill()
+            await solver.proc.wait()
+            return
+        self.idle.put_nowait(solver)
+
+    async def start(self):
+        await asyncio.gather(*(self._spawn() for _ in range(self.size)))
+
+    async def _replace(self, solver):
+        solver.kill()
+        self.solvers.discard(solver)
+        if not self.closed:
+            await self._spawn()
+
+    async def solve(self, n, e, c):
+        solver = await self.idle.get()
+        try:
+            pin = await solver.solve(n, e, c)
+        except BaseException:
+            # 被取消或出错时 solver 可能还在算上一题, 不能还回池里: 杀掉并在后台补一个新的
+            task = asyncio.ensure_future(self._replace(solver))
+            self.replacing.add(task)
+            task.add_done_callback(self._replaced)
+            raise
+        self.idle.put_nowait(solver)
+        return pin
+
+    def _replaced(self, task):
+        self.replacing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log("pool", f"replacing a solver failed: {task.exception()!r}")
+
+    async def close(self):
+        self.closed = True
+        # closed 已置位, 补到一半的 solver 启动后会自己退出; 等它们结束再统一清理
+        await asyncio.gather(*self.replacing, return_exceptions=True)
+        for s in list(self.solvers):
+            s.kill()
+            if s.proc is not None:
+                await s.proc.wait()
+
+
+def _warm_pow():
+    # 让工作进程提前 import pow (和 gmpy2)
+    return kctf_pow.HAVE_GMP
+
+
+async def attempt(idx, host, port, pool, pow_exec, timeout):
+    loop = asyncio.get_running_loop()
+    reader, writer = await asyncio.open_connection(host, port)
+    tag = f"conn {idx}"
+    try:
+        params = {}
+        while len(params) < 3:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("server closed before sending n/e/c")
+            text = line.decode(errors="replace").strip()
+            m = POW_RE.search(text)
+            if m:
+                t = loop.time()
+                solution = await loop.run_in_executor(pow_exec, kctf_pow.solve_challenge, m.group(1))
+                writer.write(solution.encode() + b"\n")
+                await writer.drain()
+                log(tag, f"PoW solved in {loop.time() - t:.2f}s")
+                continue
+            m = PARAM_RE.match(text)
+            if m:
+                params[m.group(1)] = m.group(2)
+        t0 = loop.time()  # 服务器在打印 c 之后才开始 alarm(30)
+        pin = await asyncio.wait_for(pool.solve(params["n"], params["e"], params["c"]), timeout)
+        if pin is None:
+            log(tag, f"PIN not in the MITM range ({loop.time() - t0:.2f}s)")
+            return None
+        writer.write(pin + b"\n")
+        await writer.drain()
+        log(tag, f"PIN {pin!r} sent {loop.time() - t0:.2f}s after c")
+        try:
+            response = await asyncio.wait_for(reader.read(), 5)
+        except asyncio.TimeoutError:
+            log(tag, "server did not answer within 5s after the PIN")
+            return None
+        log(tag, f"server: {response.decode(errors='replace').strip()}")
+        flag = FLAG_RE.search(response)
+        return flag.group().decode() if flag else None
+    except asyncio.TimeoutError:
+        log(tag, "solver timed out")
+        return None
+    finally:
+        writer.close()
+
+
+async def run(args):
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.pool)
+    cmd = [args.solver, "--serve", str(threads)] + ([str(args.bits)] if args.bits else [])
+    pool = SolverPool(cmd, args.pool)
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(args.conns) as pow_exec:
+        t = time.time()
+        await asyncio.gather(pool.start(), *(loop.run_in_executor(pow_exec, _warm_pow) for _ in range(args.conns)))
+        log("pool", f"{args.pool} solver(s) x {threads} thread(s) and {args.conns} PoW worker(s) ready "
+                    f"in {time.time() - t:.2f}s")
+
+        todo = iter(range(args.attempts))
+        flag = None
+
+        async def lane():
+            nonlocal flag
+            for idx in todo:
+                if flag:
+                    return
+                try:
+                    result = await attempt(idx, args.host, args.port, pool, pow_exec, args.timeout)
+                except (OSError, ConnectionError, RuntimeError) as exc:
+                    log(f"conn {idx}", f"failed: {exc}")
+                    continue
+                if result:
+                    flag = result
+                    return
+
+        lanes = [asyncio.ensure_future(lane()) for _ in range(args.conns)]
+        try:
+            while lanes:
+                done, lanes = await asyncio.wait(lanes, return_when=asyncio.FIRST_COMPLETED)
+                if flag:
+                    for t in lanes:
+                        t.cancel()
+                    await asyncio.gather(*lanes, return_exceptions=True)
+                    break
+        finally:
+            await pool.close()
+    if flag:
+        log("flag", flag)
+    else:
+        log("done", "no flag")
+    return flag
+
+
+def main():
+    ap = argparse.ArgumentParser(description="supersanic2: 预热 solver 池 + 进程内 PoW 的异步客户端")
+    ap.add_argument("--host", default=HOST)
+    ap.add_argument("--port", type=int, default=PORT)
+    ap.add_argument("--solver", default=CPP_EXECUTABLE, help="支持 --serve 的 solver 路径 (默认 ./solve)")
+    ap.add_argument("--conns", type=int, default=1, help="并发连接数")
+    ap.add_argument("--attempts", type=int, default=1, help="总连接次数, 拿到 flag 即停")
+    ap.add_argument("--pool", type=int, default=None, help="常驻 solver 个数 (默认等于 --conns)")
+    ap.add_argument("--threads", type=int, default=None, help="每个 solver 的线程数 (默认 核数 / --pool)")
+    ap.add_argument("--bits", type=int, default=None, help="r1, r2 < 2^bits (默认 solver 内置的 24)")
+    ap.add_argument("--timeout", type=float, default=28.0, help="单次求解的超时秒数 (服务器 alarm 为 30)")
+    args = ap.parse_args()
+    args.pool = args.pool or args.conns
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,8 @@
 # limitations under the License.
 
 import base64
+import collections
+import functools
 import os
 import secrets
 import sys
@@ -33,6 +35,16 @@ MODULUS = 2**1279 - 1
 CHALSIZE = 2**128
 
 SOLVER_URL = "https://goo.gle/kctf-pow"
+BYPASS_KEY = "/kctf/pow-bypass/pow-bypass-key-pub.pem"
+
+# serve: verified (challenge, solution) pairs remembered to reject replays (LRU: a pair that
+# keeps being replayed stays remembered; only pairs idle for this many newer ones are dropped)
+REPLAY_CACHE = 1 << 16
+
+# calibrate writes, and "ask auto" reads, the measured difficulty profile
+PROFILE = os.environ.get("POW_PROFILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "pow_profile.json"))
+# backend that stock kCTF solvers run; the profile difficulty targets it
+REFERENCE_BACKEND = "gmpy2" if HAVE_GMP else "python"
 
 
 def python_sloth_root(x, diff, p):
@@ -62,15 +74,52 @@ def gmpy_sloth_square(y, diff, p):
     return int(y)
 
 
+# For a Mersenne modulus p = 2**k - 1, (p + 1) // 4 == 2**(k - 2), so one root
+# step is k - 2 squarings, and x mod p == (x & p) + (x >> k) needs no division.
+def is_mersenne(p):
+    return p > 3 and (p + 1) & p == 0
+
+
+def mersenne_sloth_root(x, diff, p, use_gmp=HAVE_GMP):
+    k = p.bit_length()
+    if use_gmp:
+        x, p = gmpy2.mpz(x), gmpy2.mpz(p)
+    for i in range(diff):
+        for j in range(k - 2):
+            x = x * x
+            x = (x & p) + (x >> k)
+            if x >= p:
+                x -= p
+        x ^= 1
+    return int(x)
+
+
+def mersenne_sloth_square(y, diff, p, use_gmp=HAVE_GMP):
+    k = p.bit_length()
+    if use_gmp:
+        y, p = gmpy2.mpz(y), gmpy2.mpz(p)
+    for i in range(diff):
+        y ^= 1
+        y = y * y
+        y = (y & p) + (y >> k)
+        if y >= p:
+            y -= p
+    return int(y)
+
+
 def sloth_root(x, diff, p):
-    if HAVE_GMP:
+    if is_mersenne(p):
+        return mersenne_sloth_root(x, diff, p)
+    elif HAVE_GMP:
         return gmpy_sloth_root(x, diff, p)
     else:
         return python_sloth_root(x, diff, p)
 
 
 def sloth_square(x, diff, p):
-    if HAVE_GMP:
+    if is_mersenne(p):
+        return mersenne_sloth_square(x, diff, p)
+    elif HAVE_GMP:
         return gmpy_sloth_square(x, diff, p)
     else:
         return python_sloth_square(x, diff, p)
@@ -107,15 +156,21 @@ def solve_challenge(chal):
     return encode_challenge([y])
 
 
-def can_bypass(chal, sol):
+@functools.lru_cache(maxsize=None)
+def bypass_key(path=BYPASS_KEY):
     from ecdsa import VerifyingKey
-    from ecdsa.util import sigdecode_der
 
+    with open(path, "r") as fd:
+        return VerifyingKey.from_pem(fd.read())
+
+
+def can_bypass(chal, sol):
     if not sol.startswith("b."):
         return False
+    from ecdsa.util import sigdecode_der
+
     sig = bytes.fromhex(sol[2:])
-    with open("/kctf/pow-bypass/pow-bypass-key-pub.pem", "r") as fd:
-        vk = VerifyingKey.from_pem(fd.read())
+    vk = bypass_key()
     return vk.verify(
         signature=sig,
         data=bytes(chal, "ascii"),
@@ -133,14 +188,236 @@ def verify_challenge(chal, sol, allow_bypass=True):
     return (x == res) or (MODULUS - x == res)
 
 
+def _verify_job(chal, sol, allow_bypass):
+    # runs in a serve worker process; malformed input is just a failed proof
+    try:
+        return bool(verify_challenge(chal, sol, allow_bypass))
+    except Exception:
+        return False
+
+
+class VerifyService:
+    """
+    Line protocol, one request per line, answered in order per connection:
+      challenge $difficulty          -> $challenge
+      verify $challenge $solution    -> ok | fail | replay
+      stats                          -> counters as key=value pairs
+    Proofs are checked on a process pool; pairs that already passed (or are being
+    checked right now) are answered "replay" without touching the pool.
+    """
+
+    def __init__(self, workers=None, cache_size=REPLAY_CACHE, allow_bypass=True):
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.pool = ProcessPoolExecutor(workers)
+        self.allow_bypass = allow_bypass
+        self.cache_size = cache_size
+        self.verified = collections.OrderedDict()
+        self.inflight = set()
+        self.stats = collections.Counter()
+
+    async def verify(self, chal, sol):
+        import asyncio
+
+        key = (chal, sol)
+        if key in self.verified:
+            self.verified.move_to_end(key)
+            self.stats["replay"] += 1
+            return "replay"
+        if key in self.inflight:
+            self.stats["replay"] += 1
+            return "replay"
+        self.inflight.add(key)
+        try:
+            loop = asyncio.get_running_loop()
+            ok = await loop.run_in_executor(self.pool, _verify_job, chal, sol, self.allow_bypass)
+        finally:
+            self.inflight.discard(key)
+        if not ok:
+            self.stats["fail"] += 1
+            return "fail"
+        self.verified[key] = True
+        if len(self.verified) > self.cache_size:
+            self.verified.popitem(last=False)
+        self.stats["ok"] += 1
+        return "ok"
+
+    async def request(self, line):
+        parts = line.split()
+        if len(parts) == 2 and parts[0] == "challenge" and parts[1].isdigit():
+            self.stats["challenge"] += 1
+            return get_challenge(int(parts[1]))
+        if len(parts) == 3 and parts[0] == "verify":
+            return await self.verify(parts[1], parts[2])
+        if parts == ["stats"]:
+            stats = dict(self.stats, inflight=len(self.inflight), cached=len(self.verified))
+            return " ".join("{}={}".format(k, v) for k, v in sorted(stats.items()))
+        self.stats["error"] += 1
+        return "error"
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = await self.request(line.decode("utf-8", "replace"))
+                writer.write(reply.encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        import asyncio
+
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        sys.stderr.write("pow verify service on {}:{}\n".format(host, port))
+        sys.stderr.flush()
+        async with server:
+            await server.serve_forever()
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def serve(address):
+    import asyncio
+    import signal
+
+    host, _, port = address.rpartition(":")
+    # SIGTERM shuts the worker pool down like Ctrl-C instead of orphaning it
+    signal.signal(signal.SIGTERM, _interrupt)
+    service = VerifyService()
+    try:
+        asyncio.run(service.serve(host or "0.0.0.0", int(port)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.pool.shutdown(cancel_futures=True)
+
+
+def backends():
+    out = []
+    if HAVE_GMP:
+        out.append(("mersenne-gmpy2", mersenne_sloth_root, mersenne_sloth_square))
+    out.append(("mersenne-int",
+                lambda x, diff, p: mersenne_sloth_root(x, diff, p, False),
+                lambda y, diff, p: mersenne_sloth_square(y, diff, p, False)))
+    if HAVE_GMP:
+        out.append(("gmpy2", gmpy_sloth_root, gmpy_sloth_square))
+    out.append(("python", python_sloth_root, python_sloth_square))
+    return out
+
+
+def bench(diff):
+    import time
+
+    x = secrets.randbelow(CHALSIZE)
+    sys.stdout.write("sloth over 2**{}-1, difficulty {}\n".format(MODULUS.bit_length(), diff))
+    expected = None
+    for name, root, square in backends():
+        start = time.perf_counter()
+        y = root(x, diff, MODULUS)
+        t_root = time.perf_counter() - start
+        start = time.perf_counter()
+        res = square(y, diff, MODULUS)
+        t_square = time.perf_counter() - start
+        ok = res in (x, MODULUS - x) and (expected is None or y == expected)
+        expected = y if expected is None else expected
+        sys.stdout.write("  {:14} root {:8.3f}s  square {:8.4f}s  {}\n".format(
+            name, t_root, t_square, "ok" if ok else "MISMATCH"))
+    sys.stdout.flush()
+
+
+def _fit(fn, min_time):
+    # time fn(diff) for doubling diff until a run takes min_time; least squares t = a + b * diff
+    import time
+
+    points, diff = [], 1
+    while True:
+        start = time.perf_counter()
+        fn(diff)
+        t = time.perf_counter() - start
+        points.append((diff, t))
+        if t >= min_time:
+            break
+        diff *= 2
+    n = len(points)
+    mx = sum(d for d, _ in points) / n
+    my = sum(t for _, t in points) / n
+    var = sum((d - mx) ** 2 for d, _ in points)
+    b = sum((d - mx) * (t - my) for d, t in points) / var if var else my / mx
+    return max(b, 1e-9), my - b * mx
+
+
+def calibrate(target):
+    import json
+    import platform
+    import time
+
+    x = secrets.randbelow(CHALSIZE)
+    profile = {
+        "host": platform.node(),
+        "cpu": platform.processor() or platform.machine(),
+        "modulus_bits": MODULUS.bit_length(),
+        "target_solve_seconds": target,
+        "reference": REFERENCE_BACKEND,
+        "created": int(time.time()),
+        "backends": {},
+    }
+    sys.stdout.write("calibrating sloth over 2**{}-1 for a {}s solve\n".format(MODULUS.bit_length(), target))
+    for name, root, square in backends():
+        root_b, root_a = _fit(lambda d: root(x, d, MODULUS), 0.5)
+        y = root(x, 64, MODULUS)
+        square_b, square_a = _fit(lambda d: square(y, d, MODULUS), 0.05)
+        diff = max(1, int((target - root_a) / root_b))
+        profile["backends"][name] = {
+            "root_per_iter": root_b,
+            "square_per_iter": square_b,
+            "difficulty": diff,
+            "verify_seconds": square_a + square_b * diff,
+        }
+        sys.stdout.write("  {:14} root {:9.3f}ms/iter  square {:7.4f}ms/iter  -> difficulty {:7}  verify {:.4f}s\n".format(
+            name, root_b * 1e3, square_b * 1e3, diff, square_a + square_b * diff))
+    ref = profile["backends"][REFERENCE_BACKEND]
+    profile["difficulty"] = ref["difficulty"]
+    profile["verify_seconds"] = ref["verify_seconds"]
+    with open(PROFILE, "w") as fd:
+        json.dump(profile, fd, indent=2)
+    sys.stdout.write("difficulty {} ({} solver, verify {:.4f}s) written to {}\n".format(
+        profile["difficulty"], REFERENCE_BACKEND, profile["verify_seconds"], PROFILE))
+    sys.stdout.flush()
+
+
+def load_profile(path=PROFILE):
+    import json
+
+    with open(path) as fd:
+        return json.load(fd)
+
+
 def usage():
     sys.stdout.write("Usage:\n")
     sys.stdout.write("Solve pow: {} solve $challenge\n")
     sys.stdout.write("Check pow: {} ask $difficulty\n")
-    sys.stdout.write("  $difficulty examples (for 1.6GHz CPU) in fast mode:\n")
-    sys.stdout.write("             1337:   1 sec\n")
-    sys.stdout.write("             31337:  30 secs\n")
-    sys.stdout.write("             313373: 5 mins\n")
+    sys.stdout.write("Benchmark: {} bench $difficulty\n")
+    sys.stdout.write("Verify service: {} serve [$host:]$port\n")
+    sys.stdout.write("Calibrate: {} calibrate $target_seconds  (then: ask auto)\n")
+    try:
+        profile = load_profile()
+        per_iter = profile["backends"][profile["reference"]]["root_per_iter"]
+        sys.stdout.write("  $difficulty examples (measured on {}, {} solver):\n".format(
+            profile["host"], profile["reference"]))
+        for diff in (1337, 31337, 313373):
+            sys.stdout.write("             {}: {:.1f} secs\n".format(diff, diff * per_iter))
+    except (OSError, ValueError, KeyError):
+        sys.stdout.write("  $difficulty examples (for 1.6GHz CPU) in fast mode:\n")
+        sys.stdout.write("             1337:   1 sec\n")
+        sys.stdout.write("             31337:  30 secs\n")
+        sys.stdout.write("             313373: 5 mins\n")
     sys.stdout.flush()
     sys.exit(1)
 
@@ -153,7 +430,7 @@ def main():
     cmd = sys.argv[1]
 
     if cmd == "ask":
-        difficulty = int(sys.argv[2])
+        difficulty = load_profile()["difficulty"] if sys.argv[2] == "auto" else int(sys.argv[2])
 
         if difficulty == 0:
             sys.stdout.write("== proof-of-work: disabled ==\n")
@@ -189,6 +466,18 @@ def main():
             sys.stdout.write("Proof-of-work fail")
             sys.stdout.flush()
 
+    elif cmd == "serve":
+        serve(sys.argv[2])
+        sys.exit(0)
+
+    elif cmd == "calibrate":
+        calibrate(float(sys.argv[2]))
+        sys.exit(0)
+
+    elif cmd == "bench":
+        bench(int(sys.argv[2]))
+        sys.exit(0)
+
     elif cmd == "solve":
         challenge = sys.argv[2]
         solution = solve_challenge(challenge)
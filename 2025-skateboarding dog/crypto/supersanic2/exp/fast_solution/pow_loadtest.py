@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+pow.py serve 的压测: 几百个并发客户端各自先取 challenge 并在进程池里解好 (不计时),
+再同时开始 verify, 按比例混入重放 (应答 replay) 和错误解 (应答 fail), 统计吞吐和 verify 延迟分位数。
+
+用法:
+  python3 pow_loadtest.py --spawn                          # 本地起一个 pow.py serve 再压
+  python3 pow_loadtest.py --addr 10.0.0.5:1337 --clients 500 --rounds 5
+"""
+
+import argparse
+import asyncio
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pow as kctf_pow
+
+
+class Result:
+    def __init__(self):
+        self.latency = []
+        self.mismatch = 0
+        self.errors = 0
+
+
+async def call(reader, writer, line):
+    writer.write(line.encode() + b"\n")
+    await writer.drain()
+    reply = await reader.readline()
+    if not reply:
+        raise ConnectionError("service closed the connection")
+    return reply.decode().strip()
+
+
+async def prepare(idx, host, port, args, result, pool):
+    """建连接, 取 --rounds 个 challenge 并在进程池里解好; 解题不计入压测时间"""
+    loop = asyncio.get_running_loop()
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        result.errors += 1
+        return None
+    try:
+        chals = [await call(reader, writer, "challenge {}".format(args.difficulty)) for _ in range(args.rounds)]
+        sols = await asyncio.gather(*(loop.run_in_executor(pool, kctf_pow.solve_challenge, c) for c in chals))
+    except (OSError, ConnectionError):
+        result.errors += 1
+        writer.close()
+        return None
+    return reader, writer, list(zip(chals, sols))
+
+
+async def client(idx, conn, args, result):
+    rng = random.Random(idx)
+    reader, writer, solved = conn
+    try:
+        for chal, sol in solved:
+            checks = [(sol, "ok")]
+            if rng.random() < args.replay:
+                checks.append((sol, "replay"))
+            if rng.random() < args.bad:
+                # 换成另一个 challenge 的解
+                checks.append((kctf_pow.encode_challenge([rng.randrange(kctf_pow.MODULUS)]), "fail"))
+            for s, expect in checks:
+                t = time.perf_counter()
+                got = await call(reader, writer, "verify {} {}".format(chal, s))
+                result.latency.append(time.perf_counter() - t)
+                if got != expect:
+                    result.mismatch += 1
+    except (OSError, ConnectionError):
+        result.errors += 1
+    finally:
+        writer.close()
+
+
+def quantile(sorted_xs, q):
+    return sorted_xs[min(len(sorted_xs) - 1, int(q * len(sorted_xs)))] if sorted_xs else 0.0
+
+
+async def run(args):
+    host, _, port = args.addr.rpartition(":")
+    host, port = host or "127.0.0.1", int(port)
+    result = Result()
+    # 先把所有 challenge 取回并在进程池里解完 (在事件循环里同步解题会让客户端轮流阻塞, 量到的就不是并发负载)
+    with ProcessPoolExecutor() as pool:
+        conns = await asyncio.gather(*(prepare(i, host, port, args, result, pool) for i in range(args.clients)))
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(i, c, args, result) for i, c in enumerate(conns) if c is not None))
+    elapsed = time.perf_counter() - t0
+
+    lat = sorted(result.latency)
+    print("[loadtest] {} clients x {} rounds, difficulty {}: {} verify requests in {:.2f}s ({:,.0f}/s)".format(
+        args.clients, args.rounds, args.difficulty, len(lat), elapsed, len(lat) / elapsed if elapsed else 0))
+    print("[loadtest] verify latency p50 {:.1f}ms  p95 {:.1f}ms  p99 {:.1f}ms  max {:.1f}ms".format(
+        *(1e3 * quantile(lat, q) for q in (0.5, 0.95, 0.99, 1.0))))
+    print("[loadtest] mismatched replies {}, connection errors {}".format(result.mismatch, result.errors))
+    reader, writer = await asyncio.open_connection(host, port)
+    print("[loadtest] service: " + await call(reader, writer, "stats"))
+    writer.close()
+    return result.mismatch == 0 and result.errors == 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="pow.py serve 压测")
+    ap.add_argument("--addr", default="127.0.0.1:31338", help="服务地址 host:port")
+    ap.add_argument("--clients", type=int, default=300, help="并发客户端数")
+    ap.add_argument("--rounds", type=int, default=3, help="每个客户端的 challenge 轮数")
+    ap.add_argument("--difficulty", type=int, default=1, help="challenge 难度 (压的是服务端, 默认 1)")
+    ap.add_argument("--replay", type=float, default=0.2, help="重放已通过的解的比例")
+    ap.add_argument("--bad", type=float, default=0.1, help="提交错误解的比例")
+    ap.add_argument("--spawn", action="store_true", help="在本地启动 pow.py serve --addr")
+    args = ap.parse_args()
+
+    proc = None
+    if args.spawn:
+        proc = subprocess.Popen([sys.executable, kctf_pow.__file__, "serve", args.addr])
+        time.sleep(1.0)
+    try:
+        ok = asyncio.run(run(args))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
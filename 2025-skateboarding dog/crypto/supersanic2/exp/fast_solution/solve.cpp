@@ -11,6 +11,7 @@
 #include <gmp.h>
 #include <algorithm> // For std::min
 #include <cstdio>    // For fprintf, stderr
+#include <cstdlib>   // For atoi
 
 // ... (SharedState 结构体和 build_map_worker, search_worker 函数保持不变) ...
 struct SharedState {
@@ -88,90 +89,126 @@ void search_worker(
 }
 
 
-// --- main 函数 ---
-// CHANGED: 修改函数签名以接收命令行参数
-int main(int argc, char *argv[]) {
-    // CHANGED: 检查命令行参数的数量
-    if (argc != 4) {
-        // 向标准错误输出用法信息，避免干扰脚本捕获 stdout
-        fprintf(stderr, "Usage: %s <n> <e> <c>\n", argv[0]);
-        return 1; // 返回错误码
-    }
-
-    const unsigned int NUM_THREADS = 14;
-    const unsigned long BIT = 1 << 24;
-
-    mpz_t n, e, c;
-    // CHANGED: 从命令行参数 argv 初始化 GMP 大数
-    // argv[0] 是程序名, argv[1] 是第一个参数 (n)
-    // argv[2] 是第二个参数 (e), argv[3] 是第三个参数 (c)
-    mpz_init_set_str(n, argv[1], 10);
-    mpz_init_set_str(e, argv[2], 10);
-    mpz_init_set_str(c, argv[3], 10);
-
-    SharedState state;
+// --- 单个实例: 两阶段 MITM, 找到则把 6 字节 PIN 写入 pin 并返回 true ---
+bool solve_one(const mpz_t n, const mpz_t e, const mpz_t c, SharedState& state,
+               unsigned int num_threads, unsigned long bit, unsigned char pin[6]) {
+    state.M.clear();
+    state.solution_found.store(false);
     std::vector<std::thread> threads;
 
     // --- 阶段一：并行构建 Map ---
-    // std::cout << "Phase 1: Building map with " << NUM_THREADS << " threads..." << std::endl;
-    unsigned long chunk_size1 = (BIT + NUM_THREADS - 1) / NUM_THREADS;
-    for (unsigned int i = 0; i < NUM_THREADS; ++i) {
-        unsigned long start = i * chunk_size1 + 1;
-        unsigned long end = std::min((i + 1) * chunk_size1 + 1, BIT);
+    unsigned long chunk_size = (bit + num_threads - 1) / num_threads;
+    for (unsigned int i = 0; i < num_threads; ++i) {
+        unsigned long start = i * chunk_size + 1;
+        unsigned long end = std::min((i + 1) * chunk_size + 1, bit);
         if (start < end) {
             threads.emplace_back(build_map_worker, start, end, std::ref(state), std::cref(c), std::cref(e), std::cref(n));
         }
     }
-
     for (auto& t : threads) {
         t.join();
     }
     threads.clear();
-    // std::cout << "Phase 1: Map built. Size: " << state.M.size() << std::endl;
 
     // --- 阶段二：并行搜索 ---
-    // std::cout << "Phase 2: Searching for match with " << NUM_THREADS << " threads..." << std::endl;
-    unsigned long chunk_size2 = (BIT + NUM_THREADS - 1) / NUM_THREADS;
-    for (unsigned int i = 0; i < NUM_THREADS; ++i) {
-        unsigned long start = i * chunk_size2 + 1;
-        unsigned long end = std::min((i + 1) * chunk_size2 + 1, BIT);
-         if (start < end) {
+    for (unsigned int i = 0; i < num_threads; ++i) {
+        unsigned long start = i * chunk_size + 1;
+        unsigned long end = std::min((i + 1) * chunk_size + 1, bit);
+        if (start < end) {
             threads.emplace_back(search_worker, start, end, std::ref(state), std::cref(e), std::cref(n));
         }
     }
-
     for (auto& t : threads) {
         t.join();
     }
 
-    // --- 输出结果 ---
-    if (state.solution_found.load()) {
-        unsigned long r1 = state.final_r1.load();
-        unsigned long r2 = state.final_r2.load();
-        // std::cout << "\nSolution found!" << std::endl;
-        // std::cout << "r1 = " << r1 << std::endl;
-        // std::cout << "r2 = " << r2 << std::endl;
+    if (!state.solution_found.load()) {
+        return false;
+    }
+    mpz_t m;
+    mpz_init(m);
+    mpz_set_ui(m, state.final_r1.load());
+    mpz_mul_ui(m, m, state.final_r2.load());
+    // m 不足 6 字节时左侧补零
+    size_t count = 0;
+    unsigned char buf[16] = {0};
+    mpz_export(buf, &count, 1, sizeof(unsigned char), 1, 0, m);
+    std::fill(pin, pin + 6, 0);
+    if (count <= 6) {
+        std::copy(buf, buf + count, pin + 6 - count);
+    }
+    mpz_clear(m);
+    return count <= 6;
+}
 
-        mpz_t m, r1_mpz, r2_mpz;
-        mpz_inits(m, r1_mpz, r2_mpz, NULL);
+// --- 常驻模式 ---
+// 进程启动、线程数探测和 Map 预分配都在拿到题目之前完成; 之后每行读入 "n e c"(十进制),
+// 回写一行: 找到则为 PIN 的十六进制, 否则为 "-"。stdin 关闭即退出。
+int serve(unsigned int num_threads, unsigned long bit) {
+    SharedState state;
+    state.M.reserve(bit);
+    std::cout << "ready" << std::endl;
+
+    std::string ns, es, cs;
+    while (std::cin >> ns >> es >> cs) {
+        mpz_t n, e, c;
+        mpz_init_set_str(n, ns.c_str(), 10);
+        mpz_init_set_str(e, es.c_str(), 10);
+        mpz_init_set_str(c, cs.c_str(), 10);
+        unsigned char pin[6];
+        if (solve_one(n, e, c, state, num_threads, bit, pin)) {
+            char hex[13];
+            for (int i = 0; i < 6; ++i) {
+                snprintf(hex + 2 * i, 3, "%02x", pin[i]);
+            }
+            std::cout << hex << std::endl;
+        } else {
+            std::cout << "-" << std::endl;
+        }
+        mpz_clears(n, e, c, NULL);
+    }
+    return 0;
+}
 
-        mpz_set_ui(r1_mpz, r1);
-        mpz_set_ui(r2_mpz, r2);
-        mpz_mul(m, r1_mpz, r2_mpz);
+// --- main 函数 ---
+// 用法: solve <n> <e> <c>          一次性求解, stdout 输出 6 字节 PIN
+//       solve --serve [threads] [bits]   常驻模式 (见 serve), 给 exp_async.py 的预热进程池用;
+//                                        r1, r2 < 2^bits (默认 24)
+int main(int argc, char *argv[]) {
+    unsigned long bit = 1UL << 24;
+    unsigned int num_threads = 14;
+
+    if (argc >= 2 && std::string(argv[1]) == "--serve") {
+        if (argc >= 3) {
+            num_threads = std::max(1, atoi(argv[2]));
+        } else if (std::thread::hardware_concurrency() > 0) {
+            num_threads = std::thread::hardware_concurrency();
+        }
+        if (argc >= 4) {
+            bit = 1UL << atoi(argv[3]);
+        }
+        return serve(num_threads, bit);
+    }
 
-        // gmp_printf("m = r1 * r2 = %Zd\n", m);
+    if (argc != 4) {
+        // 向标准错误输出用法信息，避免干扰脚本捕获 stdout
+        fprintf(stderr, "Usage: %s <n> <e> <c>\n       %s --serve [threads] [bits]\n", argv[0], argv[0]);
+        return 1; // 返回错误码
+    }
 
-        size_t size = 6;
-        unsigned char pin[size];
-        mpz_export(pin, NULL, 1, sizeof(unsigned char), 1, 0, m);
+    mpz_t n, e, c;
+    // argv[1] 是 n, argv[2] 是 e, argv[3] 是 c
+    mpz_init_set_str(n, argv[1], 10);
+    mpz_init_set_str(e, argv[2], 10);
+    mpz_init_set_str(c, argv[3], 10);
 
-        // std::cout << "PIN (as bytes): ";
-        for(size_t i = 0; i < size; ++i) {
+    SharedState state;
+    unsigned char pin[6];
+    if (solve_one(n, e, c, state, num_threads, bit, pin)) {
+        for (size_t i = 0; i < 6; ++i) {
             std::cout << pin[i];
         }
         std::cout << std::endl;
-
-        mpz_clears(m, r1_mpz, r2_mpz, NULL);
     } else {
         std::cout << "\nSolution not found in the given range." << std::endl;
     }
@@ -1,19 +1,199 @@
+import argparse
+import heapq
+import os
+import shutil
+import tempfile
+from multiprocessing import Pool
+
 from gmpy2 import *
-from tqdm import trange
+from tqdm import tqdm, trange
 
 n = 7135517964857345986384676813059352121405955869561239750490230955115952389579169560047019481920085080310683129943900768395126968285415636545368460222455803
 e = 65537
 c = 3748476030038120902661212453799113590549801913348505885343509393069031840035588760715165407161110017955423289166170922771040926119756113678789834553686060
 
 bit = 2**24
-M = {}
 
-for r1 in trange(1, bit):
-    M[c * powmod(r1, -e, n) % n] = r1
+# disk 模式的记录: 64 位指纹 + 32 位下标, 大端 12 字节, 字节序即数值序
+REC = 12
+FP_MASK = (1 << 64) - 1
+# 下标只占低 32 位, r 不能超过 2^32
+MAX_BITS = 32
+# 每个进程归并时每边最多同时打开的 run 文件数 (上限, 实际还按 RLIMIT_NOFILE 和进程数缩小)
+FAN_IN = 32
+
+
+def mitm_dict(n, e, c, bit, bit2=None):
+    """原始做法: 左边 (r1 < bit) 全部放进内存字典, 右边 (r2 < bit2, 默认同 bit) 逐个查表"""
+    M = {}
+    for r1 in trange(1, bit):
+        M[c * powmod(r1, -e, n) % n] = r1
+
+    for r2 in trange(1, bit2 or bit):
+        x = powmod(r2, e, n) % n
+        if x in M:
+            return M[x] * r2
+    return None
+
+
+def _side_value(side, r, n, e, c):
+    # 左边 c * r^-e, 右边 r^e; 二者相等 <=> (r1 * r2)^e = c
+    return c * powmod(r, -e, n) % n if side == 0 else powmod(r, e, n)
+
+
+def write_runs(task):
+    """
+    生成一段 [lo, hi) 的 (指纹, 下标) 记录, 按指纹高位分到 buckets 个桶,
+    每个桶排序后写成一个有序 run 文件, 返回写出的记录数
+    """
+    side, lo, hi, n, e, c, buckets, tmpdir = task
+    n, e, c = mpz(n), mpz(e), mpz(c)
+    parts = [[] for _ in range(buckets)]
+    for r in range(lo, hi):
+        fp = int(_side_value(side, r, n, e, c)) & FP_MASK
+        parts[fp * buckets >> 64].append(fp << 32 | r)
+    for k, part in enumerate(parts):
+        part.sort()
+        with open(os.path.join(tmpdir, f"s{side}-b{k}-{lo}.run"), "wb") as f:
+            f.write(b"".join(x.to_bytes(REC, "big") for x in part))
+    return hi - lo
+
+
+def read_run(path, block=1 << 16):
+    with open(path, "rb") as f:
+        while True:
+            buf = f.read(REC * block)
+            if not buf:
+                return
+            for i in range(0, len(buf), REC):
+                yield int.from_bytes(buf[i:i + REC], "big")
+
+
+def merge_runs(paths, out_path, block=1 << 16):
+    """把若干有序 run 归并成一个有序 run, 删掉输入"""
+    with open(out_path, "wb") as f:
+        buf = []
+        for rec in heapq.merge(*[read_run(p) for p in paths]):
+            buf.append(rec.to_bytes(REC, "big"))
+            if len(buf) == block:
+                f.write(b"".join(buf))
+                buf = []
+        f.write(b"".join(buf))
+    for p in paths:
+        os.remove(p)
+
+
+def bounded_runs(tmpdir, prefix, fan_in):
+    """按 fan_in 一组多趟归并, 直到以 prefix 开头的 run 不超过 fan_in 个; 返回剩下的 run 路径"""
+    runs = sorted(os.path.join(tmpdir, p) for p in os.listdir(tmpdir) if p.startswith(prefix))
+    level = 0
+    while len(runs) > fan_in:
+        merged = []
+        for i in range(0, len(runs), fan_in):
+            group = runs[i:i + fan_in]
+            if len(group) == 1:
+                merged.append(group[0])
+                continue
+            out = os.path.join(tmpdir, f"{prefix}m{level}-{i}.run")
+            merge_runs(group, out)
+            merged.append(out)
+        runs, level = merged, level + 1
+    return runs
+
+
+def _groups(stream):
+    """把有序记录流按指纹分组: yield (fp, [下标, ...])"""
+    fp, idx = None, []
+    for rec in stream:
+        f = rec >> 32
+        if f != fp:
+            if idx:
+                yield fp, idx
+            fp, idx = f, []
+        idx.append(rec & 0xFFFFFFFF)
+    if idx:
+        yield fp, idx
+
+
+def join_bucket(task):
+    """对一个桶做流式 k 路归并, 两边指纹相同的才用完整 powmod 复核; 返回 (pin 或 None, 碰撞数)"""
+    k, n, e, c, tmpdir, fan_in = task
+    n, e, c = mpz(n), mpz(e), mpz(c)
+    # 每边约 bit / chunk 个 run, 一次全打开会超出文件描述符上限: 先分趟归并到 fan_in 个以内
+    left = _groups(heapq.merge(*[read_run(p) for p in bounded_runs(tmpdir, f"s0-b{k}-", fan_in)]))
+    right = _groups(heapq.merge(*[read_run(p) for p in bounded_runs(tmpdir, f"s1-b{k}-", fan_in)]))
+    a, b = next(left, None), next(right, None)
+    collisions = 0
+    while a is not None and b is not None:
+        if a[0] < b[0]:
+            a = next(left, None)
+        elif a[0] > b[0]:
+            b = next(right, None)
+        else:
+            for r1 in a[1]:
+                for r2 in b[1]:
+                    collisions += 1
+                    if powmod(r1 * r2, e, n) == c:
+                        return r1 * r2, collisions
+            a, b = next(left, None), next(right, None)
+    return None, collisions
+
+
+def mitm_disk(n, e, c, bit, workers=None, chunk=1 << 20, buckets=None, tmpdir=None, bit2=None):
+    """
+    外存 sort-merge MITM: 两边都在进程池里分块生成 (指纹, 下标) 记录, 按指纹高位分桶写成有序 run,
+    再按桶并行做 k 路归并连接。内存只与 chunk 成正比, 磁盘约 2 * bit * 12 字节。
+    """
+    workers = workers or os.cpu_count()
+    bit2 = bit2 or bit
+    buckets = buckets or 4 * workers
+    # 每个进程归并时两边各开 fan_in 个 run, 全部进程加起来留在 RLIMIT_NOFILE 以内
+    try:
+        import resource
+        limit = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+    except (ImportError, ValueError):
+        limit = 1024
+    if limit < 0:
+        limit = 1 << 20
+    fan_in = max(2, min(FAN_IN, (limit - 64) // (2 * workers)))
+    tmpdir = tempfile.mkdtemp(prefix="mitm-", dir=tmpdir)
+    try:
+        tasks = [(side, lo, min(lo + chunk, top), int(n), int(e), int(c), buckets, tmpdir)
+                 for side, top in ((0, bit), (1, bit2)) for lo in range(1, top, chunk)]
+        with Pool(workers) as pool:
+            with tqdm(total=bit + bit2 - 2, desc="runs") as bar:
+                for done in pool.imap_unordered(write_runs, tasks):
+                    bar.update(done)
+            with tqdm(total=buckets, desc="merge") as bar:
+                for pin, _ in pool.imap_unordered(join_bucket, [(k, int(n), int(e), int(c), tmpdir, fan_in) for k in range(buckets)]):
+                    bar.update()
+                    if pin is not None:
+                        pool.terminate()
+                        return pin
+        return None
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="pin = r1 * r2 的中间相遇攻击")
+    parser.add_argument("--mode", choices=("dict", "disk"), default="dict",
+                        help="dict: 内存字典 (原做法); disk: 多进程分块写有序 run + 外存 k 路归并")
+    parser.add_argument("--bits", type=int, default=bit.bit_length() - 1, help="r1, r2 的取值上界 2^bits")
+    parser.add_argument("--bits2", type=int, default=None, help="r2 的上界 2^bits2 (默认同 --bits; 见 exp_cancellation/mitm_plan.py)")
+    parser.add_argument("--workers", type=int, default=None, help="disk 模式的进程数 (默认全部核心)")
+    parser.add_argument("--chunk", type=int, default=1 << 20, help="disk 模式每个 run 任务的记录数")
+    parser.add_argument("--tmpdir", default=None, help="disk 模式放 run 文件的目录 (需约 2^bits * 24 字节)")
+    args = parser.parse_args()
+    if args.bits > MAX_BITS or (args.bits2 or 0) > MAX_BITS:
+        parser.error(f"--bits/--bits2 最大 {MAX_BITS} (disk 记录里下标只有 32 位)")
+    bit = 1 << args.bits
+    bit2 = 1 << args.bits2 if args.bits2 else bit
 
-for r2 in trange(1, bit):
-    x = powmod(r2, e, n) % n
-    if x in M:
-        pin = int.to_bytes(M[x] * r2, 6)
+    if args.mode == "disk":
+        m = mitm_disk(n, e, c, bit, args.workers, args.chunk, tmpdir=args.tmpdir, bit2=bit2)
+    else:
+        m = mitm_dict(n, e, c, bit, bit2)
+    if m is not None:
+        pin = int.to_bytes(int(m), 6)
         print(pin)
-        break
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Adleman-Manders-Miller (AMM) 模素数 r 次开方。
+
+RootExtractor 对固定的 (p, r) 一次性完成与密文无关的预计算, 之后可以批量对很多密文求出全部 r 个根;
+nth_roots 把任意指数 e 拆成素因子逐层开方, 供 exp.py 的 CRT 解密步骤使用。
+"""
+import math
+import random
+from functools import lru_cache
+
+import sympy
+
+try:
+    import gmpy2
+    power, inverse = gmpy2.powmod, gmpy2.invert
+except ImportError:
+    power, inverse = pow, lambda a, n: pow(a, -1, n)
+
+
+class RootExtractor:
+    """
+    模素数 p 的 r 次方根 (r 为素数)。构造时完成全部与密文无关的预计算:
+    p - 1 = r^s * t 的分解、非 r 次剩余 rho、Sylow r-子群的生成元 c = rho^t 及其各次 r 幂、
+    r 阶单位根 zeta 的全部幂次与离散对数表; 之后每个密文只需 O(s) 次幂运算即可得到全部 r 个根。
+    r 不整除 p - 1 时 r 次方是双射, 直接用 r 在 p - 1 下的逆元开方。
+    """
+
+    def __init__(self, p, r, seed=0):
+        p, r = int(p), int(r)
+        self.p, self.r = p, r
+        if (p - 1) % r:
+            self.s, self.d = 0, int(inverse(r, p - 1))
+            return
+        t, s = p - 1, 0
+        while t % r == 0: t //= r; s += 1
+        self.s, self.t = s, t
+        # r * alpha - 1 = k * t, 使 delta^(r*alpha - 1) 落入 Sylow r-子群
+        k = next(k for k in range(1, r + 1) if (k * t + 1) % r == 0)
+        self.alpha, self.kt = (k * t + 1) // r, k * t
+        rng = random.Random(seed)
+        while True:
+            rho = rng.randrange(2, p)
+            if power(rho, (p - 1) // r, p) != 1: break
+        c = power(rho, t, p)
+        self.c_pows = [c]  # c^(r^i), i = 0..s
+        for _ in range(s): self.c_pows.append(power(self.c_pows[-1], r, p))
+        zeta = self.c_pows[s - 1]  # r 阶本原单位根
+        self.zetas = [1]
+        for _ in range(r - 1): self.zetas.append(self.zetas[-1] * zeta % p)
+        # zeta 的离散对数: 小步表 + 大步因子 (r 较小时表即全部单位根)
+        self.log_m = math.isqrt(r - 1) + 1
+        self.log_table = {int(self.zetas[j]): j for j in range(self.log_m)}
+        self.log_giant = int(inverse(power(zeta, self.log_m, p), p))
+
+    def _log_zeta(self, y):
+        y = int(y)
+        for i in range(self.log_m):
+            j = self.log_table.get(y)
+            if j is not None: return i * self.log_m + j
+            y = y * self.log_giant % self.p
+        raise ValueError("element is not a power of zeta")
+
+    def root(self, delta):
+        """delta 的一个 r 次方根; delta 不是 r 次剩余时返回 None"""
+        p, r = self.p, self.r
+        delta = int(delta) % p
+        if delta == 0: return 0
+        if not self.s: return int(power(delta, self.d, p))
+        if power(delta, (p - 1) // r, p) != 1: return None
+        s, c_pows = self.s, self.c_pows
+        b = power(delta, self.kt, p); h = 1
+        for i in range(1, s):
+            d = power(b, r ** (s - 1 - i), p)
+            j = (-self._log_zeta(d)) % r if d != 1 else 0
+            if j:
+                b = b * power(c_pows[i], j, p) % p
+                h = h * power(c_pows[i - 1], j, p) % p
+        return int(power(delta, self.alpha, p) * h % p)
+
+    def roots(self, delta):
+        """delta 的全部 r 次方根 (非剩余时为空列表)"""
+        x = self.root(delta)
+        if x is None: return []
+        if x == 0 or not self.s: return [x]
+        return [x * z % self.p for z in self.zetas]
+
+    def roots_many(self, deltas):
+        """对一批密文复用同一份预计算"""
+        return [self.roots(delta) for delta in deltas]
+
+
+@lru_cache(maxsize=None)
+def root_extractor(p, r):
+    """按 (p, r) 缓存的 RootExtractor"""
+    return RootExtractor(p, r)
+
+
+def nth_roots(c, e, p):
+    """c 模素数 p 的全部 e 次方根: 按 e 的素因子逐层用 AMM 开方"""
+    layer = {int(c) % int(p)}
+    for r, mult in sympy.factorint(int(e)).items():
+        extractor = root_extractor(int(p), int(r))
+        for _ in range(mult):
+            layer = {x for y in layer for x in extractor.roots(y)}
+    return sorted(layer)
+
+
+def nth_roots_many(cs, e, p):
+    """一批密文在同一素数下的全部 e 次方根"""
+    return [nth_roots(c, e, p) for c in cs]
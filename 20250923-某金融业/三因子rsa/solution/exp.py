@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
+import os
 import time
 import math
+import argparse
 import random
+import collections
+import threading
 import concurrent.futures
+from array import array
+from multiprocessing import shared_memory
 from functools import reduce
-from itertools import product
 import sympy
-from sympy.ntheory.modular import crt
+
+from amm import nth_roots
+from search_metrics import SearchMetrics, attach_worker, worker_tick
+from tile_coord import Coordinator, parse_address, run_worker
 
 # --- 核心修正: 明确定义全局标志位 ---
 IS_PWNTOOLS_AVAILABLE = False
@@ -44,138 +52,634 @@ CHALLENGE_DATA = {
     "dk": 0x1211655116c24db65ea6553aecdabc06842fc485b8c89aa08e9a974d997b0842ddd142dd6712b40adff9442a4c340567568578ebdd509fb3483532f9d1e4f78d13a9a0e447935ed58bbf262bbc799c40227bcd5a5bc312531a8800000000000,
     "e2": 7,
     "enc": 0x3773fd7f928a0231c0a26e48678984fc36db84f4d63de0cdb36a3101e6e48e140a21b6a6fae834dfaa2670d36444a5f002d28a5d4a9efb6822af43d4d98f4aa9a18139b76527049d2c4419d7ad4ddd9ef65ec7176842aa9ced2f8b14af7bf731,
+    "unknown_bits": 44,
     "num_workers": 6,
+    "memory_budget": None,  # 字节; None 表示 Baby Steps 表取 sqrt(bound) 不设上限
+    "engine": "auto",  # bsgs / kangaroo / auto (按内存预算比较期望步数)
+    "metrics_path": None,  # 搜索指标 JSON lines 输出文件 (None 表示只显示状态行)
+    "serve": None,  # 多机协调者监听地址 host:port
+    "coordinator": None,  # 节点模式下协调者的地址 host:port
 }
 
 # --- 2. 核心算法与辅助函数 ---
 def lcm(a, b): return (a * b) // gcd(a, b) if a and b else 0
 
+FP_MASK = (1 << 64) - 1
+
+def _fingerprint(val):
+    """取残差的低 64 位作为定宽指纹 (残差近似均匀分布, 低位足够分散)"""
+    return int(val & FP_MASK)
+
+def _attach_shm(name):
+    """按名字挂载共享内存; 3.13+ 关闭 resource_tracker 跟踪, 避免子进程退出时误删"""
+    try: return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError: return shared_memory.SharedMemory(name=name)
+
+class BabyStepIndex:
+    """
+    Baby Steps 紧凑索引: 按指纹分片的开放寻址哈希表, 槽位存 (64 位指纹, j+1), 0 表示空槽。
+    整张表放在一块共享内存里, 子进程按 desc 描述零拷贝挂载, 不再逐进程反序列化整张 dict;
+    各分片互不重叠, 建表时每个进程只写自己负责的分片, 无需加锁。
+    指纹可能碰撞, 命中后需要调用方用完整幂运算确认。
+    """
+    def __init__(self, shm, shards, shard_slots, idx_code, owner):
+        self.shm, self.shards, self.shard_slots, self.idx_code, self.owner = shm, shards, shard_slots, idx_code, owner
+        self.mask = shard_slots - 1
+        slots = shards * shard_slots
+        self.keys = shm.buf[:slots * 8].cast('Q')
+        self.vals = shm.buf[slots * 8:slots * (8 + array(idx_code).itemsize)].cast(idx_code)
+
+    @staticmethod
+    def layout(M, shards=1):
+        """容纳 M 条记录所需的 (每片槽位数, 下标类型码, 字节数), 每片负载因子约 1/2 并留出波动余量"""
+        per_shard = -(-M // shards)
+        shard_slots = 1 << max(4, (2 * per_shard + 8 * math.isqrt(per_shard) + 16).bit_length())
+        idx_code = 'I' if M < (1 << 32) - 1 else 'Q'
+        return shard_slots, idx_code, shards * shard_slots * (8 + array(idx_code).itemsize)
+
+    @classmethod
+    def create(cls, M, shards=1):
+        shard_slots, idx_code, size = cls.layout(M, shards)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        return cls(shm, shards, shard_slots, idx_code, True)
+
+    @classmethod
+    def attach(cls, desc):
+        name, shards, shard_slots, idx_code = desc
+        return cls(_attach_shm(name), shards, shard_slots, idx_code, False)
+
+    @property
+    def desc(self): return (self.shm.name, self.shards, self.shard_slots, self.idx_code)
+
+    @property
+    def nbytes(self): return self.shm.size
+
+    def shard_of(self, fp): return (fp >> 32) % self.shards
+
+    def insert(self, fp, j):
+        keys, vals, mask = self.keys, self.vals, self.mask
+        offset = self.shard_of(fp) * self.shard_slots
+        slot = fp & mask
+        for _ in range(self.shard_slots):
+            if not vals[offset + slot]:
+                keys[offset + slot] = fp; vals[offset + slot] = j + 1
+                return
+            slot = (slot + 1) & mask
+        raise RuntimeError("baby-step index shard overflow")
+
+    def lookup(self, fp):
+        """依次产出指纹等于 fp 的所有 j (碰撞时可能多于一个)"""
+        keys, vals, mask = self.keys, self.vals, self.mask
+        offset = self.shard_of(fp) * self.shard_slots
+        slot = fp & mask
+        while True:
+            j1 = vals[offset + slot]
+            if not j1: return
+            if keys[offset + slot] == fp: yield j1 - 1
+            slot = (slot + 1) & mask
+
+    def close(self):
+        self.keys.release(); self.vals.release(); self.shm.close()
+        if self.owner: self.shm.unlink()
+
+def baby_step_worker(args):
+    """
+    Phase 1a: 从 base^start 起计算 [start, end) 段的 Baby Steps, 指纹按 j 写入共享数组 fps;
+    同时按分片把 j 分桶, 写入共享数组 order 的 [start, end) 段 (各分片连续存放), 返回每片的条数。
+    """
+    try: import gmpy2; power_local = gmpy2.powmod
+    except ImportError: power_local = pow
+    base, modulus, start, end, fps_name, order_name, shards, idx_code = args
+    shm = _attach_shm(fps_name); fps = shm.buf.cast('Q')
+    order_shm = _attach_shm(order_name); order = order_shm.buf.cast(idx_code)
+    buckets = [array(idx_code) for _ in range(shards)]
+    try:
+        val = power_local(base, start, modulus)
+        for block in range(start, end, TICK_STEPS):
+            for j in range(block, min(block + TICK_STEPS, end)):
+                fp = _fingerprint(val)
+                fps[j] = fp; buckets[(fp >> 32) % shards].append(j)
+                val = (val * base) % modulus
+            worker_tick(min(TICK_STEPS, end - block))
+        pos = start
+        for bucket in buckets:
+            order[pos:pos + len(bucket)] = memoryview(bucket); pos += len(bucket)
+        return [len(bucket) for bucket in buckets]
+    finally: fps.release(); shm.close(); order.release(); order_shm.close()
+
+def index_build_worker(args):
+    """Phase 1b: 只读 order 里属于第 shard 片的各段 (每个 Phase 1a 段一个 (offset, count)), 插入共享索引"""
+    fps_name, order_name, index_desc, slices = args
+    shm = _attach_shm(fps_name); fps = shm.buf.cast('Q')
+    index = BabyStepIndex.attach(index_desc)
+    order_shm = _attach_shm(order_name); order = order_shm.buf.cast(index.idx_code)
+    try:
+        for offset, count in slices:
+            for j in order[offset:offset + count]: index.insert(fps[j], j)
+    finally: fps.release(); shm.close(); order.release(); order_shm.close(); index.close()
+
 def giant_step_worker(args):
     """为并行 BSGS 设计的工作函数，在自己的区间内搜索 Giant Steps"""
     try: import gmpy2; power_local = gmpy2.powmod
     except ImportError: power_local = pow
-    base, target, modulus, M, start_i, end_i, baby_steps = args
-    factor = power_local(base, -M, modulus)
-    giant_step_val = (target * power_local(factor, start_i, modulus)) % modulus
-    for i in range(start_i, end_i):
-        if giant_step_val in baby_steps:
-            j = baby_steps[giant_step_val]
-            x = i * M + j
-            if power_local(base, x, modulus) == target: return x
-        giant_step_val = (giant_step_val * factor) % modulus
-    return None
+    base, target, modulus, M, start_i, end_i, index_desc = args
+    index = BabyStepIndex.attach(index_desc)
+    try:
+        factor = power_local(base, -M, modulus)
+        giant_step_val = (target * power_local(factor, start_i, modulus)) % modulus
+        for block in range(start_i, end_i, TICK_STEPS):
+            for i in range(block, min(block + TICK_STEPS, end_i)):
+                for j in index.lookup(_fingerprint(giant_step_val)):
+                    x = i * M + j
+                    if power_local(base, x, modulus) == target: return x
+                giant_step_val = (giant_step_val * factor) % modulus
+            worker_tick(min(TICK_STEPS, end_i - block))
+        return None
+    finally: index.close()
 
-def parallel_bsgs_v2(base, target, modulus, bound, num_workers, p_log):
-    """最终优化版 BSGS: 串行构建 Baby Steps, 并行搜索 Giant Steps"""
-    M = int(math.sqrt(bound)) + 1
-    p_log.status(f"Phase 1: Serially building {M:,} baby steps...")
-    baby_steps = {}; val = 1
-    for j in range(M):
-        if val not in baby_steps: baby_steps[val] = j
-        val = (val * base) % modulus
-    p_log.status(f"Phase 2: Searching {M:,} giant steps across {num_workers} cores...")
-    chunk_size = (M + num_workers - 1) // num_workers; tasks = []
-    with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers) as executor:
-        for i in range(num_workers):
-            start = i * chunk_size; end = min((i + 1) * chunk_size, M)
-            if start >= end: continue
-            tasks.append(executor.submit(giant_step_worker, (base, target, modulus, M, start, end, baby_steps)))
-        for future in concurrent.futures.as_completed(tasks):
-            result = future.result()
-            if result is not None:
-                executor.shutdown(wait=False, cancel_futures=True); return result
-    return None
+def _chunks(total, parts):
+    """把 [0, total) 均分为至多 parts 段"""
+    size = (total + parts - 1) // parts
+    return [(s, min(s + size, total)) for s in range(0, total, size)]
+
+def make_pool(num_workers, metrics=None):
+    """进程池; 给出 metrics 时每个工作进程在启动时领取一个计数槽位"""
+    if metrics is None: return concurrent.futures.ProcessPoolExecutor(max_workers=num_workers)
+    return concurrent.futures.ProcessPoolExecutor(max_workers=num_workers, initializer=attach_worker, initargs=(metrics.handle,))
+
+def run_jobs(executor, jobs, inflight):
+    """
+    在同一个进程池上交错调度多个生成器形式的搜索任务, 返回各任务的结果。
+    任务逐阶段 yield (units, race), units 为 [(fn, args), ...]; 一个阶段全部完成后把结果列表 send 回任务,
+    race 阶段只要某个单元返回非 None 就取消该任务剩余的单元; 任务 return 的值即其结果。
+    各任务待提交的单元按轮转顺序送入进程池, 池中最多同时排队 inflight 个单元。
+    """
+    results = [None] * len(jobs); stages = {}; queues = {}; pending = {}
+
+    def advance(i, value):
+        while True:
+            try: units, race = jobs[i].send(value)
+            except StopIteration as stop:
+                results[i] = stop.value; stages.pop(i, None); queues.pop(i, None); return
+            if units: break
+            value = []
+        stages[i] = [[None] * len(units), len(units), race]
+        queues[i] = collections.deque((u, fn, args) for u, (fn, args) in enumerate(units))
+
+    def finish_stage(i, value):
+        for future, (j, _) in list(pending.items()):
+            if j == i: future.cancel(); del pending[future]
+        advance(i, value)
+
+    try:
+        for i in range(len(jobs)): advance(i, None)
+        while queues or pending:
+            while len(pending) < inflight and any(queues.values()):
+                for i in list(queues):
+                    if queues[i] and len(pending) < inflight:
+                        u, fn, args = queues[i].popleft()
+                        pending[executor.submit(fn, args)] = (i, u)
+            finished, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                if future not in pending: continue
+                i, u = pending.pop(future)
+                stage = stages[i]; stage[0][u] = result = future.result(); stage[1] -= 1
+                if stage[2] and result is not None: queues[i].clear(); finish_stage(i, stage[0])
+                elif stage[1] == 0: finish_stage(i, stage[0])
+    finally:
+        for future in pending: future.cancel()
+        for job in jobs: job.close()
+    return results
+
+SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+def parse_size(text):
+    """解析 "512M" / "4G" / "1073741824" 形式的内存大小, 返回字节数"""
+    text = str(text).strip().upper().removesuffix("B").removesuffix("I")
+    unit = text[-1] if text and text[-1] in SIZE_UNITS else ""
+    return int(float(text[:len(text) - len(unit)]) * SIZE_UNITS[unit])
+
+def format_size(n):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024: return f"{n:,.1f} {unit}"
+        n /= 1024
+    return f"{n:,.1f} TiB"
+
+def bsgs_memory(M, num_workers):
+    """M 条 Baby Steps 的峰值内存: 共享索引 + 建表期间的指纹数组、分桶下标数组及各进程的分桶缓冲"""
+    _, idx_code, size = BabyStepIndex.layout(M, num_workers)
+    return size + M * (8 + 2 * array(idx_code).itemsize)
+
+def plan_bsgs(bound, num_workers, memory_budget=None):
+    """
+    选取 Baby/Giant 划分 (M, G), 满足 M * G >= bound。
+    不限内存时取 M = sqrt(bound); 给定 memory_budget 时取预算内最大的 M, 用更多 Giant Steps 补足。
+    """
+    M = math.isqrt(bound) + 1
+    if memory_budget is not None and bsgs_memory(M, num_workers) > memory_budget:
+        lo, hi = 1, M
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if bsgs_memory(mid, num_workers) <= memory_budget: lo = mid
+            else: hi = mid - 1
+        M = lo
+    return M, -(-bound // M)
+
+def _step_cost(base, modulus, rounds=2000):
+    """粗测单步 (一次模乘 + 指纹查表) 的耗时, 用于预估总时间"""
+    index = BabyStepIndex.create(rounds)
+    try:
+        val = base; t0 = time.perf_counter()
+        for j in range(rounds):
+            val = (val * base) % modulus
+            for _ in index.lookup(_fingerprint(val)): pass
+            index.insert(_fingerprint(val), j)
+        return (time.perf_counter() - t0) / rounds
+    finally: index.close()
+
+GIANT_UNITS_PER_WORKER = 8
+TICK_STEPS = 1 << 14  # 工作进程每走这么多步向 metrics 汇报一次
+
+def baby_index_job(base, modulus, M, num_workers, p_log, metrics=None, name="bsgs"):
+    """
+    构建 M 条 Baby Steps 共享内存指纹表的任务 (供 run_jobs 调度或 yield from), 返回 BabyStepIndex, 由调用者 close。
+    先并行写指纹数组 (边算边按分片分桶), 再按分片并行插入索引, 每个分片只读自己的那部分下标。
+    """
+    index = BabyStepIndex.create(M, num_workers)
+    fps = shared_memory.SharedMemory(create=True, size=M * 8)
+    order = shared_memory.SharedMemory(create=True, size=M * array(index.idx_code).itemsize)
+    if metrics is not None: metrics.gauge(f"{name}.table_bytes", index.nbytes + fps.size + order.size)
+    try:
+        p_log.status(f"Phase 1: Building {M:,} baby steps across {num_workers} cores...")
+        chunks = _chunks(M, num_workers)
+        counts = yield [(baby_step_worker, (base, modulus, s, e, fps.name, order.name, index.shards, index.idx_code))
+                        for s, e in chunks], False
+        slices = [[] for _ in range(index.shards)]
+        for (s, _), per_shard in zip(chunks, counts):
+            for shard, count in enumerate(per_shard):
+                slices[shard].append((s, count)); s += count
+        yield [(index_build_worker, (fps.name, order.name, index.desc, slices[shard])) for shard in range(index.shards)], False
+    except BaseException:
+        index.close(); raise
+    finally:
+        fps.close(); fps.unlink(); order.close(); order.unlink()
+    if metrics is not None: metrics.gauge(f"{name}.table_bytes", index.nbytes)
+    return index
+
+def giant_range_job(base, target, modulus, M, lo, hi, index_desc, units):
+    """在 Giant Steps 区间 [lo, hi) 内搜索的任务, 切成 units 个工作单元竞速, 返回命中的 x 或 None"""
+    found = yield [(giant_step_worker, (base, target, modulus, M, lo + s, lo + e, index_desc))
+                   for s, e in _chunks(hi - lo, units)], True
+    return next((x for x in found if x is not None), None)
 
-def factor_from_k(n, k):
-    """使用 k = e*d - 1 分解 n"""
-    t = k
-    while t % 2 == 0: t //= 2
-    for _ in range(100):
-        a = random.randrange(2, int(n) - 1); x = power(a, t, n)
-        if x in (1, n - 1): continue
-        y = x
-        for _ in range(int(math.log2(k))):
-            y = power(x, 2, n);
-            if y == 1: return gcd(x - 1, n)
-            if y == n - 1: break
-            x = y
-        else: continue
-    raise ValueError("Failed to find a factor.")
-
-def factor_all(n, k):
-    """完全分解 n"""
-    factors = set(); stack = [n]
-    while stack:
-        m = stack.pop()
-        if m == 1: continue
-        if sympy.isprime(m): factors.add(m); continue
-        try:
-            f = factor_from_k(m, k)
-            stack.append(f); stack.append(m // f)
-        except ValueError: factors.add(m)
-    return sorted(list(factors))
-
-def crt_worker(args):
-    """接收一组 CRT 参数，计算并验证候选 Flag"""
-    moduli, rems = args
-    a_candidate, _ = crt(moduli, rems)
-    flag_bytes = a_candidate.to_bytes((a_candidate.bit_length() + 7) // 8, 'big').lstrip(b'\x00')
+def bsgs_job(base, target, modulus, bound, num_workers, p_log, memory_budget=None, metrics=None, name="bsgs"):
+    """
+    BSGS 搜索任务 (供 run_jobs 调度): 并行构建 Baby Steps 共享内存指纹表, 并行搜索 Giant Steps。
+    memory_budget (字节) 限制 Baby Steps 表的峰值内存, 超出时缩小表并增加 Giant Steps 轮数。
+    metrics 计入 M + G 的计划步数, 并以 name 为前缀记录表大小。
+    """
+    M, G = plan_bsgs(bound, num_workers, memory_budget)
+    step = _step_cost(base, modulus)
+    cores = min(num_workers, os.cpu_count() or 1)  # 进程数多于核心时并不会更快
+    log.info(f"BSGS plan: {M:,} baby x {G:,} giant steps, ~{format_size(bsgs_memory(M, num_workers))} peak, "
+             f"~{(M + G / 2) * step / cores:,.1f}s expected / {(M + G) * step / cores:,.1f}s worst on {cores} cores"
+             + (f" (budget {format_size(memory_budget)})" if memory_budget is not None else ""))
+    if metrics is not None:
+        metrics.add_total(M + G)
+        metrics.gauge(f"{name}.baby_steps", M); metrics.gauge(f"{name}.giant_steps", G)
+    index = yield from baby_index_job(base, modulus, M, num_workers, p_log, metrics, name)
     try:
-        if flag_bytes.decode('utf-8').startswith('flag{'): return flag_bytes.decode('utf-8')
-    except UnicodeDecodeError: pass
+        p_log.status(f"Phase 2: Searching {G:,} giant steps across {num_workers} cores ({format_size(index.nbytes)} shared index)...")
+        return (yield from giant_range_job(base, target, modulus, M, 0, G, index.desc, num_workers * GIANT_UNITS_PER_WORKER))
+    finally:
+        index.close()
+        if metrics is not None: metrics.gauge(f"{name}.table_bytes", 0)
+
+def parallel_bsgs_v2(base, target, modulus, bound, num_workers, p_log, memory_budget=None, metrics=None):
+    """最终优化版 BSGS: 在独立进程池上运行单个 bsgs_job"""
+    with make_pool(num_workers, metrics) as executor:
+        job = bsgs_job(base, target, modulus, bound, num_workers, p_log, memory_budget, metrics)
+        return run_jobs(executor, [job], 2 * num_workers)[0]
+
+def kangaroo_worker(args):
+    """
+    Pollard kangaroo 工作函数: 把一群袋鼠各向前推进 steps 步。
+    herd 中每只袋鼠为 (kid, val, dist), 返回推进后的 herd 与途中遇到的 distinguished points。
+    """
+    try: import gmpy2; to_num = gmpy2.mpz
+    except ImportError: to_num = int
+    modulus, jump_vals, jump_dists, dp_mask, herd, steps = args
+    modulus = to_num(modulus); jump_vals = [to_num(v) for v in jump_vals]
+    k_mask = len(jump_vals) - 1; out, dps = [], []
+    for kid, val, dist in herd:
+        val = to_num(val)
+        for _ in range(steps):
+            fp = _fingerprint(val)
+            if not (fp >> 32) & dp_mask: dps.append((fp, kid, dist))
+            j = fp & k_mask
+            val = (val * jump_vals[j]) % modulus; dist += jump_dists[j]
+        out.append((kid, int(val), dist)); worker_tick(steps)
+    return out, dps
+
+def plan_kangaroo(bound, num_workers, herd_size=4):
+    """袋鼠数 N, distinguished point 位数, 平均跳距; 每次碰撞后约多走 N * 2^dp_bits 步"""
+    total = num_workers * herd_size
+    mean_jump = max(1, total * math.isqrt(bound) // 4)
+    dp_bits = max(0, (math.isqrt(bound) // (total * 8)).bit_length() - 1)
+    return total, dp_bits, mean_jump
+
+def kangaroo_job(base, target, modulus, bound, num_workers, p_log, herd_size=4, jumps=32, seed=0x6B616E67,
+                 metrics=None, name="kangaroo"):
+    """
+    并行 Pollard lambda (kangaroo) 搜索任务 (供 run_jobs 调度): 在 [0, bound) 内求 base^x = target, 每只袋鼠 O(1) 内存。
+    一半袋鼠为 tame (从 bound/2 附近出发, 指数已知), 一半为 wild (从 target 出发);
+    每轮各进程推进一群袋鼠, distinguished points 汇总到主进程的公共表中, tame/wild 落到同一点即可解出 x。
+    跳距表为 jumps 个以 seed 生成的伪随机步长, 均值约 N * sqrt(bound) / 4。
+    metrics 计入期望步数 (实际步数是随机的, ETA 仅供参考), 并以 name 为前缀记录 DP 表大小。
+    """
+    total, dp_bits, mean_jump = plan_kangaroo(bound, num_workers, herd_size)
+    rng = random.Random(seed)
+    jump_dists = [rng.randrange(1, 2 * mean_jump + 1) for _ in range(jumps)]
+    jump_vals = [power(base, d, modulus) for d in jump_dists]
+    dp_mask = (1 << dp_bits) - 1
+    steps = max(4 << dp_bits, 1 << 12)
+    max_steps = 32 * math.isqrt(bound) + total * (steps << 2)
+    expected = 2 * math.isqrt(bound) + total * (1 << dp_bits)
+    log.info(f"Kangaroo plan: {total} kangaroos, mean jump {mean_jump:,}, {dp_bits} DP bits, ~{expected:,} expected steps")
+    if metrics is not None: metrics.add_total(expected)
+
+    def start(kid):
+        """tame 袋鼠 kid 为偶数, wild 为奇数; 重新出发时随机错开起点以免再次并轨"""
+        offset = rng.randrange(mean_jump)
+        if kid % 2 == 0: dist = bound // 2 + offset; return (kid, int(power(base, dist, modulus)), dist)
+        return (kid, int(target * power(base, offset, modulus) % modulus), offset)
+
+    herds = [[start(u * herd_size + i) for i in range(herd_size)] for u in range(num_workers)]
+    table = {}; done_steps = 0
+    while done_steps <= max_steps:
+        outcomes = yield [(kangaroo_worker, (modulus, jump_vals, jump_dists, dp_mask, herd, steps)) for herd in herds], False
+        for u, (herd, dps) in enumerate(outcomes):
+            restart = set()
+            for fp, kid, dist in dps:
+                hit = table.get(fp)
+                if hit is None: table[fp] = (kid, dist); continue
+                other_kid, other_dist = hit
+                if (kid ^ other_kid) & 1:
+                    tame, wild = (dist, other_dist) if kid % 2 == 0 else (other_dist, dist)
+                    x = tame - wild
+                    if 0 <= x and power(base, x, modulus) == target: return x
+                elif kid != other_kid: restart.add(kid)
+            herds[u] = [start(kid) if kid in restart else (kid, val, dist) for kid, val, dist in herd]
+        done_steps += steps * total
+        if metrics is not None: metrics.gauge(f"{name}.distinguished_points", len(table))
+        p_log.status(f"Kangaroo: {done_steps:,} steps, {len(table):,} distinguished points")
     return None
 
+def parallel_kangaroo(base, target, modulus, bound, num_workers, p_log, herd_size=4, jumps=32, seed=0x6B616E67, metrics=None):
+    """并行 Pollard lambda (kangaroo), 参数与 parallel_bsgs_v2 一致; 在独立进程池上运行单个 kangaroo_job"""
+    with make_pool(num_workers, metrics) as executor:
+        job = kangaroo_job(base, target, modulus, bound, num_workers, p_log, herd_size, jumps, seed, metrics)
+        return run_jobs(executor, [job], 2 * num_workers)[0]
+
+def choose_engine(bound, num_workers, memory_budget=None):
+    """比较 BSGS (受内存预算约束) 与 kangaroo 的期望步数, 选更快的一个"""
+    M, G = plan_bsgs(bound, num_workers, memory_budget)
+    total, dp_bits, _ = plan_kangaroo(bound, num_workers)
+    return "bsgs" if M + G / 2 <= 2 * math.isqrt(bound) + total * (1 << dp_bits) else "kangaroo"
+
+def _refine(parts, g):
+    """因子精化: 用除数 g 切分当前两两互素的因子列表"""
+    out = []
+    for f in parts:
+        h = int(gcd(f, g))
+        if 1 < h < f: out += [h, f // h]
+        else: out.append(f)
+    return out
+
+def factor_all(n, k, max_bases=64):
+    """
+    一次性完全分解 n, k 为 λ(n) 的倍数 (如 e*d - 1)。
+    记 k = 2^s * t, 对前 max_bases 个素数底 a 依次计算 x = a^t, x^2, ..., x^(2^s):
+    每一层的 gcd(x ∓ 1, n) 都是 n 的一部分素因子之积, 把它们逐个用于因子精化,
+    3/4/5 素数模数的全部素因子在同一轮里分离出来。幂运算次数至多 max_bases * (s + 1),
+    只对新切出的因子做一次素性检验, 全部为素数即提前结束。
+    """
+    n = int(n); t, s = k, 0
+    while t % 2 == 0: t //= 2; s += 1
+    is_prime = gmpy2.is_prime if IS_GMPY2_AVAILABLE else sympy.isprime
+    parts, primes = [n], set()
+    for a in sympy.sieve.primerange(2, sympy.prime(max_bases) + 1):
+        divisors = [gcd(a, n)]; x = power(a, t, n)
+        for _ in range(s + 1):
+            divisors += [gcd(x - 1, n), gcd(x + 1, n)]
+            if x == 1: break
+            x = power(x, 2, n)
+        for g in divisors:
+            if 1 < g < n: parts = _refine(parts, g)
+        primes.update(f for f in parts if f not in primes and is_prime(f))
+        if len(primes) == len(parts): break
+    return sorted(parts)
+
+FLAG_PREFIX = b"flag{"
+FLAG_CHARSET = frozenset(range(0x20, 0x7f))  # 可打印 ASCII
+
+def _plaintext_intervals(prefix, limit):
+    """以 prefix 开头的各长度明文对应的整数区间 (lo, hi, 字节长度), 截断到 [0, limit)"""
+    head = int.from_bytes(prefix, 'big')
+    for length in range(max(len(prefix), 1), (limit.bit_length() + 7) // 8 + 1):
+        shift = 8 * (length - len(prefix))
+        lo, hi = head << shift, min((head + 1) << shift, limit)
+        if not prefix: lo = 1 << (8 * (length - 1)) if length > 1 else 0
+        if lo < hi: yield lo, hi, length
+
+def garner_candidates(moduli, residue_sets, prefix=b"", charset=None):
+    """
+    Garner 式 CRT 枚举: 逐个固定模数的余数, 增量维护 x mod P_j (每层一次乘法, 不再整组重做 CRT),
+    惰性产出落在明文约束内的解。约束为: 大端字节 (去掉前导零) 以 prefix 开头, 其余字节都属于 charset。
+    每个可能的明文长度对应一个整数区间; 当 P_j 超过区间宽度时区间内至多剩一个候选, 可直接检查其字节,
+    不满足的部分组合整枝剪掉。余数少的模数排在前面, 分支尽量推迟到约束已经收紧之后。
+    """
+    order = sorted(range(len(moduli)), key=lambda i: len(residue_sets[i]))
+    moduli = [int(moduli[i]) for i in order]; residue_sets = [[int(r) for r in residue_sets[i]] for i in order]
+    limit = math.prod(moduli)
+    prefix_len = len(prefix)
+    steps, P = [], 1
+    for p in moduli: steps.append((p, P, int(inverse(P % p, p)) if P > 1 else 1)); P *= p
+
+    def feasible(x, P, lo, hi, length):
+        y = lo + (x - lo) % P
+        if y >= hi: return False
+        if charset is not None and y + P >= hi:
+            return all(b in charset for b in y.to_bytes(length, 'big')[prefix_len:])
+        return True
+
+    def walk(j, x, live):
+        if j == len(steps): yield x; return
+        p, P, inv_P = steps[j]
+        for r in residue_sets[j]:
+            nx = x + P * ((r - x) * inv_P % p)
+            nlive = [iv for iv in live if feasible(nx, P * p, *iv)]
+            if nlive: yield from walk(j + 1, nx, nlive)
+
+    yield from walk(0, 0, list(_plaintext_intervals(prefix, limit)))
+
+# --- 多机 BSGS: 协调者按 Giant Steps 区间切 tile, 各节点自建 Baby Steps 表后领取 tile ---
+def distributed_job(modulus, searches, bound, num_workers, memory_budget=None, tile=None):
+    """
+    多机模式的任务描述: 每个搜索 (base, target) 按 plan_bsgs 定下 (M, G), Giant Steps 切成 tile 步一块。
+    各节点都要自建完整的 Baby Steps 表 (M 步), 只有 Giant Steps 被分摊, 因此 k 台机器时
+    单机耗时约为 M + G / (2k); 机器多时可用 memory_budget 调小 M, 把工作量挪到可分摊的 Giant Steps 上。
+    """
+    M, G = plan_bsgs(bound, max(1, num_workers), memory_budget)
+    tile = tile or max(1 << 14, G // 256)
+    return {"modulus": str(modulus), "M": M, "G": G, "tile": tile, "searches": [{"base": str(b), "target": str(t)} for b, t in searches]}
+
+def bsgs_node_kernel(job, executor, num_workers, p_log, metrics=None):
+    """节点侧: 为任务中的每个搜索建好 Baby Steps 表, 返回 kernel(tile, stop) 在本机进程池上搜索一个 tile"""
+    modulus, M, G, tile = int(job["modulus"]), job["M"], job["G"], job["tile"]
+    searches = [(int(s["base"]), int(s["target"])) for s in job["searches"]]
+    per_search = -(-G // tile)
+    indexes = run_jobs(executor, [baby_index_job(base, modulus, M, num_workers, p_log, metrics, f"s{i}")
+                                  for i, (base, _) in enumerate(searches)], 2 * num_workers)
+
+    def kernel(t, stop):
+        s, k = divmod(t, per_search)
+        base, target = searches[s]
+        lo, hi = k * tile, min((k + 1) * tile, G)
+        p_log.status(f"tile {t}: search {s}, giant steps [{lo:,}, {hi:,})")
+        return run_jobs(executor, [giant_range_job(base, target, modulus, M, lo, hi, indexes[s].desc, 2 * num_workers)],
+                        2 * num_workers)[0]
+    kernel.indexes = indexes
+    return kernel
+
+def run_bsgs_node(address, num_workers, p_log, metrics=None):
+    """作为节点连接协调者, 用本机全部核心处理领到的 tile, 直到协调者宣布结束"""
+    with make_pool(num_workers, metrics) as executor:
+        kernels = []
+        def make_kernel(job):
+            kernels.append(bsgs_node_kernel(job, executor, num_workers, p_log, metrics))
+            return kernels[-1]
+        try: run_worker(address, make_kernel)
+        finally:
+            for kernel in kernels:
+                for index in kernel.indexes: index.close()
+
+def serve_bsgs(address, searches, cfg, p_log, memory_budget=None, lease=60.0):
+    """
+    协调者: 对 searches 中的每个 (base, target) 在 [0, 2^unknown_bits) 内求离散对数, tile 交给连接进来的节点;
+    num_workers > 0 时本机也作为一个节点参与。节点失联或超过 lease 秒无心跳时其 tile 被重新分配。
+    """
+    job = distributed_job(cfg["n"], searches, 1 << cfg["unknown_bits"], cfg["num_workers"], memory_budget)
+    per_search = -(-job["G"] // job["tile"])
+    coord = Coordinator(job, [per_search] * len(searches), lease=lease)
+    host, port = coord.start(address)
+    log.info(f"Coordinator on {host}:{port}: {len(searches)} searches x {per_search} tiles "
+             f"({job['M']:,} baby steps per node, {job['tile']:,} giant steps per tile)")
+    local = None
+    if cfg["num_workers"] > 0:
+        local = threading.Thread(target=run_bsgs_node, args=(("127.0.0.1", port), cfg["num_workers"], p_log),
+                                 daemon=True)
+        local.start()
+
+    def on_poll(co):
+        snap = co.snapshot()
+        p_log.status(f"{len(snap['done'])}/{per_search * len(searches)} tiles done, {snap['leased']} leased, "
+                     f"{snap['workers']} nodes seen, solved {sorted(snap['results'])}")
+
+    try: results = coord.wait(on_poll=on_poll)
+    finally: coord.close()
+    if local is not None: local.join(timeout=10)
+    return [results.get(i) for i in range(len(searches))]
+
 # --- 3. 主执行流程 ---
+class TaggedStatus:
+    """给共用同一个进度条的多个任务的状态行加上前缀"""
+    def __init__(self, p_log, tag): self.p_log, self.tag = p_log, tag
+    def status(self, msg): self.p_log.status(f"[{self.tag}] {msg}")
+
+def exponent_job(base, target, cfg, p_log, memory_budget=None, metrics=None, name="x"):
+    """在 [0, 2^unknown_bits) 内求离散对数的搜索任务, 按 cfg["engine"] 选择 BSGS 或 kangaroo"""
+    bound = 1 << cfg["unknown_bits"]
+    engine = cfg["engine"]
+    if engine == "auto": engine = choose_engine(bound, cfg["num_workers"], memory_budget)
+    if metrics is not None: metrics.gauge(f"{name}.engine", engine)
+    if engine == "kangaroo":
+        return kangaroo_job(base, target, cfg["n"], bound, cfg["num_workers"], p_log, metrics=metrics, name=name)
+    return bsgs_job(base, target, cfg["n"], bound, cfg["num_workers"], p_log, memory_budget, metrics, name)
+
 def main():
     cfg = CHALLENGE_DATA
-    with log.progress("Step 1: Recovering d_low") as p:
-        target_d = (cfg["c_test"] * inverse(power(cfg["m_test"], cfg["dk"], cfg["n"]), cfg["n"])) % cfg["n"]
-        d_low = parallel_bsgs_v2(cfg["m_test"], target_d, cfg["n"], 1 << 44, cfg["num_workers"], p)
-        d = cfg["dk"] + d_low
-        p.success(f"Found d_low: {hex(d_low)}")
-    log.info(f"Reconstructed full d: {hex(d)}")
+    if cfg["coordinator"]:
+        with log.progress(f"Node: working tiles for coordinator {cfg['coordinator']}") as p:
+            run_bsgs_node(parse_address(cfg["coordinator"]), cfg["num_workers"], p)
+            p.success("coordinator finished")
+        return
 
-    with log.progress("Step 2: Recovering e_low") as p:
-        target_e = (cfg["m_test"] * inverse(power(cfg["c_test"], cfg["ek"], cfg["n"]), cfg["n"])) % cfg["n"]
-        e_low = parallel_bsgs_v2(cfg["c_test"], target_e, cfg["n"], 1 << 44, cfg["num_workers"], p)
-        e = cfg["ek"] + e_low
-        p.success(f"Found e_low: {hex(e_low)}")
+    target_d = (cfg["c_test"] * inverse(power(cfg["m_test"], cfg["dk"], cfg["n"]), cfg["n"])) % cfg["n"]
+    target_e = (cfg["m_test"] * inverse(power(cfg["c_test"], cfg["ek"], cfg["n"]), cfg["n"])) % cfg["n"]
+    # 同时驻留两张 Baby Steps 表, 内存预算各分一半
+    budget = cfg["memory_budget"] // 2 if cfg["memory_budget"] is not None else None
+    if cfg["serve"]:
+        # 多机: 各节点领取 Giant Steps tile, 引擎固定为 BSGS
+        with log.progress(f"Step 1-2: Coordinating d_low / e_low search on {cfg['serve']}") as p:
+            d_low, e_low = serve_bsgs(parse_address(cfg["serve"]),
+                                      [(cfg["m_test"], target_d), (cfg["c_test"], target_e)], cfg, p, budget)
+            p.success(f"Found d_low: {hex(d_low)}, e_low: {hex(e_low)}")
+    else:
+        with log.progress("Step 1-2: Recovering d_low and e_low concurrently") as p:
+            # 两个搜索共用一个进程池, 工作单元交错提交
+            # 每秒采样一次各进程的步数/内存, 汇总行写到进度条上, --metrics 给出文件时同时追加 JSON lines
+            metrics = SearchMetrics(f"dlog/{cfg['engine']}", cfg["num_workers"], path=cfg["metrics_path"], status=p.status)
+            with metrics, make_pool(cfg["num_workers"], metrics) as executor:
+                d_low, e_low = run_jobs(executor, [
+                    exponent_job(cfg["m_test"], target_d, cfg, TaggedStatus(p, "d"), budget, metrics, "d"),
+                    exponent_job(cfg["c_test"], target_e, cfg, TaggedStatus(p, "e"), budget, metrics, "e"),
+                ], 2 * cfg["num_workers"])
+            p.success(f"Found d_low: {hex(d_low)}, e_low: {hex(e_low)}")
+    d = cfg["dk"] + d_low; e = cfg["ek"] + e_low
+    log.info(f"Reconstructed full d: {hex(d)}")
     log.info(f"Reconstructed full e: {hex(e)}")
 
     with log.progress("Step 3: Factoring n") as p:
         k = e * d - 1
         factors = factor_all(cfg["n"], k)
-        p_val, q_val, r_val = factors
         p.success(f"Found factors: {[hex(f) for f in factors]}")
 
     with log.progress("Step 4: Decrypting with CRT") as p:
         p.status("Calculating remainders...")
-        primes = [p_val, q_val, r_val]
-        remainders = []
-        for prime in primes:
-            phi = prime - 1
-            if gcd(cfg["e2"], phi) == 1:
-                d_part = inverse(cfg["e2"], phi); a_part = power(cfg["enc"], d_part, prime)
-                remainders.append([a_part])
-            else:
-                a_parts = sympy.ntheory.nthroot_mod(cfg["enc"], cfg["e2"], prime, all_roots=True)
-                remainders.append(a_parts)
-        
-        p.status("Preparing CRT candidate jobs...")
-        tasks = [((primes, rem_combo),) for rem_combo in product(*remainders)]
+        primes = factors
+        # gcd(e2, p-1) = 1 时为唯一根; 否则用 AMM 求出全部 e2 次方根 (每个 (p, r) 的预计算会被缓存复用)
+        remainders = [nth_roots(cfg["enc"], cfg["e2"], prime) for prime in primes]
+
+        p.status(f"Enumerating {math.prod(map(len, remainders)):,} CRT combinations with {FLAG_PREFIX!r} prefix pruning...")
         final_flag = None
-        p.status(f"Verifying {len(tasks)} candidates across {cfg['num_workers']} cores...")
-        with concurrent.futures.ThreadPoolExecutor(max_workers=cfg['num_workers']) as executor:
-            results = executor.map(crt_worker, *zip(*tasks))
-            for result in results:
-                if result is not None:
-                    final_flag = result
-                    break
+        for a_candidate in garner_candidates(primes, remainders, FLAG_PREFIX, FLAG_CHARSET):
+            final_flag = a_candidate.to_bytes((a_candidate.bit_length() + 7) // 8, 'big').decode()
+            break
         p.success("Decryption complete!")
 
     log.success(f"DECRYPTED FLAG: {final_flag}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="三因子 RSA 求解脚本")
+    parser.add_argument("--workers", type=int, default=CHALLENGE_DATA["num_workers"], help="并行进程数")
+    parser.add_argument("--memory-budget", type=parse_size, default=CHALLENGE_DATA["memory_budget"],
+                        help="BSGS Baby Steps 表的内存上限, 如 512M / 4G (默认不限制)")
+    parser.add_argument("--engine", choices=("auto", "bsgs", "kangaroo"), default=CHALLENGE_DATA["engine"],
+                        help="离散对数引擎; kangaroo 几乎不占内存, 适合 50-60 位未知量")
+    parser.add_argument("--unknown-bits", type=int, default=CHALLENGE_DATA["unknown_bits"], help="d/e 未知低位的位数")
+    parser.add_argument("--serve", metavar="HOST:PORT", default=CHALLENGE_DATA["serve"],
+                        help="多机模式: 作为协调者把 Giant Steps tile 分给 --coordinator 节点 (本机 --workers > 0 时也参与计算)")
+    parser.add_argument("--coordinator", metavar="HOST:PORT", default=CHALLENGE_DATA["coordinator"],
+                        help="节点模式: 连接协调者, 用本机 --workers 个核心处理领到的 tile")
+    parser.add_argument("--metrics", metavar="PATH", default=CHALLENGE_DATA["metrics_path"],
+                        help="把每秒的搜索指标 (步数/速率/内存/表大小/ETA) 以 JSON lines 追加到该文件")
+    args = parser.parse_args()
+    CHALLENGE_DATA.update(num_workers=args.workers, memory_budget=args.memory_budget, engine=args.engine,
+                          unknown_bits=args.unknown_bits, metrics_path=args.metrics,
+                          serve=args.serve, coordinator=args.coordinator)
+
     # 将日志打印移入主保护块，确保只执行一次
     if not IS_PWNTOOLS_AVAILABLE:
         log.warning("pwntools not found. Using basic logger. For better output, run: pip install pwntools")
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Common metrics surface for the long-running search engines.
+
+Each worker process owns one slot of a shared counter array and bumps it with
+worker_tick(); the parent samples the array on a background thread and turns it
+into per-worker steps/sec, total progress, ETA and memory use. Every sample is
+appended as one JSON object per line to an optional file and summarised on one
+terminal status line, so runs of different engines can be compared afterwards
+and a stalled or imbalanced worker stands out while the search is running.
+
+This is the only copy: supersanic2's exp_cancellation/solver_gmpy.py imports it
+from here through a sys.path entry, so fixes land in one place.
+"""
+
+import json
+import math
+import os
+import sys
+import threading
+import time
+import multiprocessing as mp
+
+# Per-process worker state: (counts array, slot) once attach_worker() ran.
+_worker = None
+
+
+def attach_worker(handle, slot=None):
+    """Bind the calling process to a metrics slot (used as a pool initializer)."""
+    global _worker
+    counts, pids, next_slot = handle
+    if slot is None:
+        with next_slot.get_lock():
+            slot = next_slot.value % len(counts)
+            next_slot.value += 1
+    pids[slot] = os.getpid()
+    _worker = (counts, slot)
+
+
+def worker_tick(n):
+    """Add n finished steps to this worker's slot; a no-op without metrics."""
+    if _worker is not None:
+        counts, slot = _worker
+        counts[slot] += n
+
+
+def _read_mem(pid):
+    """Proportional set size of pid (falls back to RSS), in bytes; 0 if unknown."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+    if pid == os.getpid():
+        try:
+            import resource
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return rss if sys.platform == "darwin" else rss * 1024
+        except ImportError:
+            pass
+    return 0
+
+
+def _fmt_count(n):
+    for unit in ("", "k", "M", "G", "T"):
+        if abs(n) < 1000:
+            return f"{n:.0f}{unit}" if unit == "" else f"{n:.1f}{unit}"
+        n /= 1000
+    return f"{n:.1f}P"
+
+
+def _fmt_bytes(n):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024:
+            return f"{n:.0f}{unit}"
+        n /= 1024
+    return f"{n:.1f}TiB"
+
+
+def _fmt_secs(s):
+    if s is None or math.isinf(s):
+        return "?"
+    if s < 120:
+        return f"{s:.1f}s"
+    if s < 7200:
+        return f"{s / 60:.1f}m"
+    return f"{s / 3600:.1f}h"
+
+
+def _stderr_status(line):
+    sys.stderr.write("\r" + line[:160].ljust(100))
+    sys.stderr.flush()
+
+
+class SearchMetrics:
+    """
+    Parent-side sampler. Create it before the workers, hand `handle` to each worker
+    process (pool initializer or Process args) and call attach_worker() there.
+
+    total     planned number of steps (may grow via add_total); 0 means unknown
+    path      JSON-lines output file, appended to; None disables the trail
+    status    callable taking the one-line summary; defaults to a stderr status line
+    """
+
+    SLOW_RATIO = 0.25
+
+    def __init__(self, engine, num_workers, total=0, path=None, interval=1.0, status=None, ctx=None):
+        ctx = ctx or mp.get_context()
+        self.engine = engine
+        self.total = total
+        self.path = path
+        self.interval = interval
+        self.status = status or _stderr_status
+        self.counts = ctx.Array("Q", num_workers, lock=False)
+        self.pids = ctx.Array("q", num_workers, lock=False)
+        self.next_slot = ctx.Value("i", 0)
+        self.gauges = {}
+        self.local_done = 0
+        self.resumed = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._file = None
+        self._start = None
+        self._last = None
+
+    @property
+    def handle(self):
+        return (self.counts, self.pids, self.next_slot)
+
+    def add_total(self, n):
+        with self._lock:
+            self.total += n
+
+    def add_done(self, n):
+        """Count steps done in the parent process (not attributed to a worker)."""
+        with self._lock:
+            self.local_done += n
+
+    def add_resumed(self, n):
+        """Count steps finished by an earlier run (checkpoint): progress, but not this run's rate/ETA."""
+        with self._lock:
+            self.resumed += n
+
+    def gauge(self, key, value):
+        """Record a named value (table sizes, phase, ...) in every following sample."""
+        with self._lock:
+            self.gauges[key] = value
+
+    def __enter__(self):
+        self._start = time.time()
+        self._last = (self._start, [0] * len(self.counts))
+        if self.path:
+            self._file = open(self.path, "a", buffering=1)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.sample(final=True)
+        if self._file:
+            self._file.close()
+        if self.status is _stderr_status:
+            sys.stderr.write("\r" + " " * 100 + "\r")
+            sys.stderr.flush()
+        return False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self, final=False):
+        """Take one sample: write a JSON line, update the status line, return the record."""
+        now = time.time()
+        counts = list(self.counts)
+        last_ts, last_counts = self._last
+        self._last = (now, counts)
+        dt = max(now - last_ts, 1e-9)
+        with self._lock:
+            total, gauges, local_done, resumed = self.total, dict(self.gauges), self.local_done, self.resumed
+        workers = []
+        for slot, (done, prev) in enumerate(zip(counts, last_counts)):
+            pid = self.pids[slot]
+            if pid:
+                workers.append({"slot": slot, "pid": pid, "done": done, "rate": (done - prev) / dt})
+        done = sum(counts) + local_done + resumed
+        elapsed = now - self._start
+        rate = (done - resumed) / elapsed if elapsed > 0 else 0.0
+        eta = (total - done) / rate if total and rate > 0 and done < total else None
+        rates = sorted(w["rate"] for w in workers)
+        median = rates[len(rates) // 2] if rates else 0.0
+        slow = [w["slot"] for w in workers if median > 0 and w["rate"] < self.SLOW_RATIO * median]
+        mem = _read_mem(os.getpid()) + sum(_read_mem(w["pid"]) for w in workers)
+        record = {
+            "ts": now, "engine": self.engine, "elapsed": elapsed, "done": done, "resumed": resumed, "total": total,
+            "rate": rate, "eta": eta, "mem_bytes": mem, "workers": workers, "slow": slow,
+            "gauges": gauges, "final": final,
+        }
+        if self._file:
+            self._file.write(json.dumps(record) + "\n")
+        if not final:
+            self.status(self.summary(record))
+        return record
+
+    @staticmethod
+    def summary(record):
+        total, done = record["total"], record["done"]
+        pct = f"{100 * done / total:5.1f}% " if total else ""
+        per = " ".join(_fmt_count(w["rate"]) + ("!" if w["slot"] in record["slow"] else "") for w in record["workers"])
+        return (f"{record['engine']} {pct}{_fmt_count(done)}"
+                + (f"/{_fmt_count(total)}" if total else "")
+                + f" {_fmt_count(record['rate'])}/s eta={_fmt_secs(record['eta'])} mem={_fmt_bytes(record['mem_bytes'])}"
+                + (f" w=[{per}]" if per else ""))
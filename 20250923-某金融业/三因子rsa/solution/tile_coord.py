@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Minimal multi-node tile coordinator for the long-running searches.
+
+The coordinator owns a numbered set of tiles (split into one or more groups, e.g.
+one per discrete log being searched) and a JSON job description. Workers connect
+over TCP and speak newline-delimited JSON request/response:
+
+  {"op": "hello", "worker": w}                  -> {"job": ..., "lease": secs}
+  {"op": "lease", "worker": w, "n": k}          -> {"tiles": [...], "stop": bool}
+  {"op": "done", "worker": w, "tiles": [...]}   -> {"stop": bool}
+  {"op": "hit", "worker": w, "tile": t, "result": r} -> {"stop": bool}
+  {"op": "heartbeat", "worker": w}              -> {"stop": bool}
+
+A leased tile belongs to its worker until it is reported done, the lease runs
+out without a heartbeat, or the worker's connection drops; then it goes back to
+the front of the queue for someone else. A hit solves the tile's group and its
+remaining tiles are dropped. The search ends when every group is solved or all
+tiles are done.
+
+Each node usually runs one worker per core (run_worker in each process), so a
+node with more cores simply leases more tiles.
+
+This is the only copy: supersanic2's exp_cancellation/solver_gmpy.py imports it
+from here through a sys.path entry, so fixes land in one place.
+"""
+
+import bisect
+import collections
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+
+def parse_address(text):
+    host, _, port = text.rpartition(":")
+    return (host or "0.0.0.0", int(port))
+
+
+class Coordinator:
+    """
+    job        JSON-serialisable description the workers build their kernels from
+    counts     number of tiles in each group; tile ids are global, group by group
+    lease      seconds a tile stays assigned without a heartbeat
+    done       tile ids already finished (e.g. from a checkpoint)
+    """
+
+    def __init__(self, job, counts, lease=30.0, done=()):
+        self.job = job
+        self.lease = lease
+        self.bounds = []
+        total = 0
+        for c in counts:
+            total += c
+            self.bounds.append(total)
+        self.done = set(done)
+        self.remaining = list(counts)  # unfinished tiles per group
+        for tile in self.done:
+            self.remaining[self.group_of(tile)] -= 1
+        self.pending = collections.deque(t for t in range(total) if t not in self.done)
+        self.leased = {}  # tile -> (worker, deadline)
+        self.results = {}  # group -> result
+        self.workers = {}  # worker -> last seen
+        self._cond = threading.Condition()
+        self._server = None
+
+    # --- state (call with the condition held) ---
+    def group_of(self, tile):
+        return bisect.bisect_right(self.bounds, tile)
+
+    def _group_open(self, tile):
+        return self.group_of(tile) not in self.results
+
+    def _finished(self):
+        return all(g in self.results or not left for g, left in enumerate(self.remaining))
+
+    def _mark_done(self, tile):
+        self.leased.pop(tile, None)
+        if tile not in self.done:
+            self.done.add(tile)
+            self.remaining[self.group_of(tile)] -= 1
+
+    def _expire(self, now):
+        for tile, (worker, deadline) in list(self.leased.items()):
+            if deadline < now:
+                del self.leased[tile]
+                self.pending.appendleft(tile)
+
+    def _release(self, worker):
+        for tile, (owner, _) in list(self.leased.items()):
+            if owner == worker:
+                del self.leased[tile]
+                self.pending.appendleft(tile)
+
+    def handle(self, msg):
+        op, worker = msg.get("op"), msg.get("worker", "?")
+        now = time.time()
+        with self._cond:
+            self.workers[worker] = now
+            self._expire(now)
+            if op == "hello":
+                return {"job": self.job, "lease": self.lease}
+            if op == "lease":
+                tiles = []
+                while self.pending and len(tiles) < msg.get("n", 1):
+                    tile = self.pending.popleft()
+                    if tile in self.done or not self._group_open(tile):
+                        continue
+                    self.leased[tile] = (worker, now + self.lease)
+                    tiles.append(tile)
+                self._cond.notify_all()
+                return {"tiles": tiles, "stop": self._finished()}
+            if op == "done":
+                for tile in msg.get("tiles", []):
+                    self._mark_done(tile)
+            elif op == "hit":
+                tile = msg["tile"]
+                self._mark_done(tile)
+                self.results.setdefault(self.group_of(tile), msg["result"])
+            elif op == "heartbeat":
+                for tile, (owner, _) in self.leased.items():
+                    if owner == worker:
+                        self.leased[tile] = (owner, now + self.lease)
+            self._cond.notify_all()
+            return {"stop": self._finished()}
+
+    def disconnected(self, worker):
+        with self._cond:
+            self._release(worker)
+            self._cond.notify_all()
+
+    # --- server ---
+    def start(self, address):
+        coord = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                worker = None
+                try:
+                    for line in self.rfile:
+                        msg = json.loads(line)
+                        worker = msg.get("worker", worker)
+                        self.wfile.write((json.dumps(coord.handle(msg)) + "\n").encode())
+                except (OSError, ValueError):
+                    pass
+                finally:
+                    if worker is not None:
+                        coord.disconnected(worker)
+
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        self._server = Server(address, Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address
+
+    def wait(self, timeout=None, poll=1.0, on_poll=None):
+        """Block until the search finished (or timeout); returns {group: result}."""
+        deadline = time.time() + timeout if timeout else None
+        with self._cond:
+            while not self._finished():
+                if deadline is not None and time.time() >= deadline:
+                    break
+                self._cond.wait(poll)
+                self._expire(time.time())
+                if on_poll is not None:
+                    on_poll(self)
+            return dict(self.results)
+
+    def snapshot(self):
+        with self._cond:
+            return {"done": set(self.done), "leased": len(self.leased), "pending": len(self.pending),
+                    "workers": len(self.workers), "results": dict(self.results)}
+
+    def close(self):
+        # keep answering "stop" briefly so running workers learn the search is over
+        if self._server is not None:
+            time.sleep(0.2)
+            self._server.shutdown()
+            self._server.server_close()
+
+
+class CoordinatorClient:
+    def __init__(self, address, worker=None, timeout=60.0):
+        self.worker = worker or f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self.sock = socket.create_connection(address, timeout=timeout)
+        self.rfile = self.sock.makefile("rb")
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+
+    def call(self, op, **kw):
+        msg = dict(kw, op=op, worker=self.worker)
+        with self.lock:
+            self.sock.sendall((json.dumps(msg) + "\n").encode())
+            line = self.rfile.readline()
+        if not line:
+            raise ConnectionError("coordinator closed the connection")
+        reply = json.loads(line)
+        if reply.get("stop"):
+            self.stop.set()
+        return reply
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+def run_worker(address, make_kernel, per_lease=1, idle=0.5, worker=None):
+    """
+    Worker loop: fetch the job, build kernel = make_kernel(job), then lease tiles and
+    run kernel(tile, stop) on each until the coordinator says stop. The kernel returns
+    a JSON-serialisable result on a hit, None otherwise, and should poll stop.is_set().
+    Heartbeats run on a background thread at a third of the lease period.
+    """
+    client = CoordinatorClient(address, worker)
+    try:
+        hello = client.call("hello")
+        kernel = make_kernel(hello["job"])
+        beat = threading.Event()
+
+        def heartbeat():
+            while not beat.wait(hello["lease"] / 3):
+                try:
+                    client.call("heartbeat")
+                except (OSError, ConnectionError, ValueError):
+                    client.stop.set()
+                    return
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+        try:
+            while not client.stop.is_set():
+                tiles = client.call("lease", n=per_lease)["tiles"]
+                if not tiles:
+                    client.stop.wait(idle)
+                    continue
+                for i, tile in enumerate(tiles):
+                    result = kernel(tile, client.stop)
+                    if result is not None:
+                        client.call("hit", tile=tile, result=result)
+                        break
+                    if client.stop.is_set():
+                        break
+                    client.call("done", tiles=[tile])
+                if client.stop.is_set():
+                    break
+        finally:
+            beat.set()
+    except (OSError, ConnectionError):
+        pass
+    finally:
+        client.close()